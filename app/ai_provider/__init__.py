@@ -1,9 +1,39 @@
 from .services import OpenAIService, BaseAIService
+from .embeddings import BaseEmbedder, HashingEmbedder, OpenAIEmbedder
 
 
 class AIProvider:
+    def __init__(self):
+        self._services: dict[str, BaseAIService] = {}
+        self._embedders: dict[str, BaseEmbedder] = {}
+
     def get_ai_service(self, service_name: str) -> BaseAIService | None:
+        service = self._services.get(service_name)
+        if service is None:
+            service = self._create_ai_service(service_name)
+            if service is not None:
+                self._services[service_name] = service
+        return service
+
+    def _create_ai_service(self, service_name: str) -> BaseAIService | None:
         provider, model = service_name.split(":", 1)
         if provider == "openai":
             return OpenAIService(model)
         return None
+
+    def get_embedder(self, embedder_name: str) -> BaseEmbedder | None:
+        embedder = self._embedders.get(embedder_name)
+        if embedder is None:
+            embedder = self._create_embedder(embedder_name)
+            if embedder is not None:
+                self._embedders[embedder_name] = embedder
+        return embedder
+
+    def _create_embedder(self, embedder_name: str) -> BaseEmbedder | None:
+        provider, _, options = embedder_name.partition(":")
+        if provider == "openai":
+            model, _, dim = options.partition(":")
+            return OpenAIEmbedder(model or "text-embedding-3-small", int(dim or 256))
+        if provider == "hashing":
+            return HashingEmbedder(int(options or 256))
+        return None
@@ -1,6 +1,16 @@
 import json
+from copy import deepcopy
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from app.cache import LRUCache
+from app.config import settings
 from app.constants import (
     BASE_PROMPT,
+    CURRENT_TIME_PROMPT,
+    CURRENT_TIME_GRANULARITY,
+    SUMMARY_IN_CHAT,
+    RECALLED_IN_CHAT,
     TEXT_MESSAGE_IN_CHAT,
     NOT_RESPONSE_TOOL_MESSAGE,
     USER_IN_CHAT,
@@ -10,23 +20,170 @@ from app.constants import (
     EXTERNAL_REPLY_IN_CHAT,
 )
 from app.db import Message, MessageType, User, Chat
-from datetime import datetime
+
+from .tokens import BaseTokenEstimator, get_token_estimator
+from datetime import datetime, timezone
+
+
+# Bump when the rendering of messages changes, invalidates memoized entries
+RENDER_VERSION = 1
+
+# Rendered conversation entries of messages, shared by all builders of the process
+rendered_messages: LRUCache[list[dict]] = LRUCache(settings.ai.renders)
+message_tokens: LRUCache[int] = LRUCache(settings.ai.renders)
+
+
+@dataclass
+class MessagesIndex:
+    """
+    Lookups over a conversation window, built once per ``build``.
+    """
+
+    users: dict[int, User] = field(default_factory=dict)
+    messages: dict[int, Message] = field(default_factory=dict)
+
+    @classmethod
+    def from_messages(cls, messages: list[Message]) -> "MessagesIndex":
+        index = cls()
+        index.add(messages)
+        return index
+
+    def add(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            if message.from_user is not None:
+                self.users.setdefault(message.from_user_id, message.from_user)
+            if message.telegram_id is not None:
+                self.messages[message.telegram_id] = message
+
+
+class ContextWindow:
+    """
+    Newest messages of a chat that fit a token budget, filled page by page.
+
+    The token total is kept running, so every message is estimated once.
+    """
+
+    def __init__(self, builder: "ConversationBuilder", budget: int, tokens: int = 0):
+        self.builder = builder
+        self.budget = budget
+        self.tokens = tokens
+        # Selected messages, newest first
+        self.messages: list[Message] = []
+        self.index = MessagesIndex()
+
+    def extend(self, messages: list[Message]) -> bool:
+        """
+        Add older messages (newest first) while they fit.
+
+        Messages are taken whole, so an assistant tool call is never separated
+        from its tool results. The newest message is always kept.
+
+        Returns:
+            bool: Whether the budget is exhausted.
+        """
+        self.index.add(messages)
+        for message in messages:
+            tokens = self.tokens + self.builder._estimate_message(message, self.index)
+            if tokens > self.budget and self.messages:
+                return True
+            self.tokens = tokens
+            self.messages.append(message)
+        return False
 
 
 class ConversationBuilder:
-    def __init__(self, assistant_user_id: int):
+    def __init__(
+        self, assistant_user_id: int, estimator: BaseTokenEstimator | None = None
+    ):
         self.assistant_user_id = assistant_user_id
+        self.estimator = estimator or get_token_estimator()
+
+    def build(
+        self,
+        chat: Chat,
+        messages: Iterable[Message],
+        summary: str | None = None,
+        recalled: list[Message] | None = None,
+    ):
+        return self._prepare_messages(chat, list(messages), summary, recalled)
 
-    def build(self, chat: Chat, messages: list[Message]):
-        return self._prepare_messages(chat, messages)
+    def render(self, messages: Iterable[Message]) -> list[dict]:
+        """
+        Render messages to conversation entries, without the system prompt.
+        """
+        messages = list(messages)
+        index = MessagesIndex.from_messages(messages)
+        conversation = []
+        for message in messages:
+            conversation.extend(self._prepare_message(message, index))
+        return conversation
+
+    def estimate(self, messages: list[Message]) -> int:
+        """
+        Estimate the prompt tokens of rendered messages.
+        """
+        index = MessagesIndex.from_messages(messages)
+        return sum(self._estimate_message(message, index) for message in messages)
+
+    def start_window(
+        self,
+        chat: Chat,
+        budget: int,
+        summary: str | None = None,
+        tool_schemas: list[dict] | None = None,
+    ) -> ContextWindow:
+        """
+        Start selecting the messages that fit the token budget.
+
+        Args:
+            chat (Chat): The chat the conversation is built for.
+            budget (int): Prompt token budget of the whole conversation.
+            summary (str): Summary of the older history, injected before the window.
+            tool_schemas (list[dict]): Schemas of the tools sent with the conversation.
+
+        Returns:
+            ContextWindow: The empty window, the fixed entries already counted.
+        """
+        tokens = self.estimator.estimate_entries(
+            [*self._prepare_system_messages(chat, summary), self._prepare_time_message()]
+        )
+        if tool_schemas:
+            tokens += self.estimator.estimate_text(json.dumps(tool_schemas))
+        return ContextWindow(self, budget, tokens)
 
-    def _prepare_messages(self, chat: Chat, messages: list[Message]) -> list[dict]:
+    def _prepare_messages(
+        self,
+        chat: Chat,
+        messages: list[Message],
+        summary: str | None = None,
+        recalled: list[Message] | None = None,
+    ) -> list[dict]:
+        conversation = self._prepare_system_messages(chat, summary)
+        conversation.extend(self.render(messages))
+        # Recalled messages change every turn, keep them out of the prefix
+        if recalled:
+            conversation.append(self._prepare_recalled_message(recalled))
+        conversation.append(self._prepare_time_message())
+        return conversation
+
+    def _prepare_recalled_message(self, recalled: list[Message]) -> dict:
+        return {
+            "role": "system",
+            "content": RECALLED_IN_CHAT.format(
+                messages="".join(
+                    entry.get("content") or "" for entry in self.render(recalled)
+                )
+            ),
+        }
+
+    def _prepare_system_messages(
+        self, chat: Chat, summary: str | None = None
+    ) -> list[dict]:
         conversation = [
             {
                 "role": "system",
                 "content": BASE_PROMPT.format(
                     user_instructions=chat.ai_settings.prompt,
-                    current_time=datetime.now().isoformat(),
                     chat_id=chat.id,
                     chat_type=chat.type,
                     chat_title=chat.title,
@@ -34,17 +191,82 @@ class ConversationBuilder:
                 ),
             }
         ]
-        for message in messages:
-            if message.type == MessageType.TOOL_CALLS:
-                conversation.extend(self._prepare_tool_call_message(message))
-            if message.type in (MessageType.AI_REFLECTION, MessageType.TEXT):
-                conversation.extend(self._prepare_message_text(message, messages))
-            if message.type == MessageType.NOTIFICATION:
-                conversation.extend(
-                    self._prepare_notification_message(message, messages)
-                )
+        if summary:
+            conversation.append(
+                {"role": "system", "content": SUMMARY_IN_CHAT.format(summary=summary)}
+            )
         return conversation
 
+    def _prepare_time_message(self) -> dict:
+        return {
+            "role": "system",
+            "content": CURRENT_TIME_PROMPT.format(
+                current_time=self._get_current_time().isoformat()
+            ),
+        }
+
+    def _get_current_time(self) -> datetime:
+        """Current UTC time, rounded down so it changes only once per granule."""
+        timestamp = datetime.now(timezone.utc).timestamp()
+        timestamp -= timestamp % CURRENT_TIME_GRANULARITY
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+    def _prepare_message(self, message: Message, index: MessagesIndex) -> list[dict]:
+        """
+        Render a message, memoized by message id and the fields of the users it shows.
+
+        The memoized entries are shared, conversations get their own copies.
+        """
+        if message.id is None:
+            return self._render_message(message, index)
+        return deepcopy(self._get_rendered_message(message, index))
+
+    def _get_rendered_message(self, message: Message, index: MessagesIndex) -> list[dict]:
+        """
+        The memoized entries of a message, must not be modified.
+        """
+        key = self._get_message_key(message, index)
+        entries = rendered_messages.get(key)
+        if entries is None:
+            entries = self._render_message(message, index)
+            rendered_messages.set(key, entries)
+        return entries
+
+    def _estimate_message(self, message: Message, index: MessagesIndex) -> int:
+        """
+        Estimate the prompt tokens of a message, memoized like its rendering.
+        """
+        if message.id is None:
+            return self.estimator.estimate_entries(self._render_message(message, index))
+        key = (self._get_message_key(message, index), self.estimator.name)
+        tokens = message_tokens.get(key)
+        if tokens is None:
+            tokens = self.estimator.estimate_entries(
+                self._get_rendered_message(message, index)
+            )
+            message_tokens.set(key, tokens)
+        return tokens
+
+    def _get_message_key(self, message: Message, index: MessagesIndex) -> tuple:
+        return (
+            message.id,
+            RENDER_VERSION,
+            self.assistant_user_id,
+            self._get_user_fingerprint(message.from_user),
+            self._get_user_fingerprint(
+                index.users.get(self._get_reply_to_user_id(message, index))
+            ),
+        )
+
+    def _render_message(self, message: Message, index: MessagesIndex) -> list[dict]:
+        if message.type == MessageType.TOOL_CALLS:
+            return self._prepare_tool_call_message(message)
+        if message.type in (MessageType.AI_REFLECTION, MessageType.TEXT):
+            return self._prepare_message_text(message, index)
+        if message.type == MessageType.NOTIFICATION:
+            return self._prepare_notification_message(message, index)
+        return []
+
     def _prepare_tool_call_message(self, message: Message) -> list[dict]:
         tool_calls = message.payload["tool_calls"]
         tool_calls_results = message.payload["tool_calls_results"]
@@ -82,40 +304,55 @@ class ConversationBuilder:
             }
         return user_info
 
+    def _get_user_fingerprint(self, user: User | None) -> tuple | None:
+        if user is None:
+            return None
+        return (user.id, user.username, user.first_name, user.last_name)
+
+    def _get_reply_to_user_id(self, message: Message, index: MessagesIndex) -> int | None:
+        reply_to = (message.payload or {}).get("reply_to")
+        if reply_to is None:
+            return None
+        user_id = reply_to.get("user_id")
+        if user_id is None and reply_to.get("type") != "external":
+            # Resolve the author of the replied message inside the window
+            reply_to_message = index.messages.get(reply_to.get("id"))
+            if reply_to_message is not None:
+                user_id = reply_to_message.from_user_id
+        return user_id
 
-    def _get_reply_to_user(self, message: Message, messages: list[Message]) -> str:
+    def _get_reply_to_user(self, message: Message, index: MessagesIndex) -> str:
         reply_to = message.payload.get("reply_to")
         if reply_to is None:
             return ""
+        user_id = self._get_reply_to_user_id(message, index)
         reply_to_user = SHORT_USER_IN_CHAT.format(
             tag="reply_to_user",
-            user_id=reply_to.get("user_id"),
-        )
-        user = next(
-            (m.from_user for m in messages if m.from_user_id == reply_to.get("user_id")), None
+            user_id=user_id,
         )
+        user = index.users.get(user_id)
         if user is not None:
             reply_to_user = USER_IN_CHAT.format(
                 tag="reply_to_user",
-                user_id=reply_to.get("user_id"),
+                user_id=user_id,
                 **self._get_user_info(user),
             )
         return reply_to_user
     
-    def _get_reply_to_message(self, message: Message, messages: list[Message]) -> str:
+    def _get_reply_to_message(self, message: Message, index: MessagesIndex) -> str:
         reply_to = (message.payload or {}).get("reply_to")
         if reply_to is None:
             return ""
         
         reply_type_content = "text"
-        reply_to_content = reply_to.get("content")
+        reply_to_content = reply_to.get("content") or ""
         if len(reply_to_content) > 50:
             reply_type_content = "short-text"
             reply_to_content = reply_to_content[:50] + "..."
         if reply_to.get("type") == "quote":
             reply_type_content = "quote"
                 
-        reply_to_user = self._get_reply_to_user(message, messages)
+        reply_to_user = self._get_reply_to_user(message, index)
         if reply_to.get("type") == "external":
             return EXTERNAL_REPLY_IN_CHAT.format(
                 reply_to_id=reply_to.get("id"),
@@ -131,7 +368,7 @@ class ConversationBuilder:
         )
 
     def _prepare_message_text(
-        self, message: Message, messages: list[Message]
+        self, message: Message, index: MessagesIndex
     ) -> list[dict]:
         if not message.content:
             return []
@@ -151,14 +388,14 @@ class ConversationBuilder:
                     ),
                     user_message=message.content,
                     content_type=(message.payload or {}).get("is_forwarded", False) and "forwarded-text" or "text",
-                    reply_to_message=self._get_reply_to_message(message, messages),
+                    reply_to_message=self._get_reply_to_message(message, index),
                     date=message.created_at.isoformat(),
                 ),
             }
         ]
 
     def _prepare_notification_message(
-        self, message: Message, messages: list[Message]
+        self, message: Message, index: MessagesIndex
     ) -> list[dict]:
         return [
             {
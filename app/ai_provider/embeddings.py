@@ -0,0 +1,78 @@
+"""
+Text embedding backends.
+"""
+
+import hashlib
+import re
+from abc import ABC, abstractmethod
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from .services.openai import get_async_client
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, so cosine similarity is a dot product."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class BaseEmbedder(ABC):
+    """
+    Embeds texts into fixed size, L2-normalized float32 vectors.
+    """
+
+    name: str
+    dim: int
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        pass
+
+
+class OpenAIEmbedder(BaseEmbedder):
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dim: int = 256,
+        client: AsyncOpenAI | None = None,
+    ):
+        self.client = client or get_async_client()
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        response = await self.client.embeddings.create(
+            model=self.model, input=texts, dimensions=self.dim
+        )
+        vectors = np.array(
+            [item.embedding for item in response.data], dtype=np.float32
+        )
+        return normalize(vectors)
+
+
+class HashingEmbedder(BaseEmbedder):
+    """
+    Deterministic local embedder (feature hashing of words), no network needed.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD_RE.findall(text.lower()):
+                digest = int.from_bytes(
+                    hashlib.blake2b(word.encode(), digest_size=8).digest(), "big"
+                )
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dim] += sign
+        return normalize(vectors)
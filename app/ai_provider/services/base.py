@@ -2,17 +2,64 @@ from abc import ABC, abstractmethod
 
 from pydantic import BaseModel
 
+from app.config import settings
+
+from ..streaming import BaseStreamListener
 from ..tools.base import BaseTool
 
 
+class AiUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    def add(self, other: "AiUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+
+
 class AiResponse(BaseModel):
     response: str | None = None
     tools: list[BaseTool]
+    usage: AiUsage | None = None
 
 
 class BaseAIService(ABC):
+    model: str
+
+    @property
+    def context_budget(self) -> int:
+        """Prompt token budget of the conversation for the model."""
+        return settings.ai.budgets.get(self.model, settings.ai.budget)
+
+    def tool_schemas(self, tools: list[BaseTool]) -> list[dict]:
+        """Schemas of the tools as sent to the model."""
+        return [tool.model_json_schema() for tool in tools]
+
     @abstractmethod
     async def generate_response(
         self, prompt: str, messages: list[dict], tools: list[BaseTool]
     ) -> AiResponse:
         pass
+
+    async def stream_response(
+        self,
+        messages: list[dict],
+        tools: list[BaseTool],
+        listener: BaseStreamListener,
+    ) -> AiResponse:
+        """
+        Generate a response, reporting text and tool calls to the listener as
+        they stream.
+
+        Services without streaming support generate the whole response at once.
+        """
+        return await self.generate_response(messages=messages, tools=tools)
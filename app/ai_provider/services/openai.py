@@ -1,39 +1,88 @@
 import json
+from functools import cache
 from json.decoder import JSONDecodeError
 import logging
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from openai.lib import pydantic_function_tool
-from openai.types.chat import ChatCompletion
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionChunk,
+    ChatCompletionMessageToolCall,
+)
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 from app.config import settings
 
+from ..streaming import BaseStreamListener
 from ..tools.base import BaseTool
-from .base import AiResponse, BaseAIService
+from .base import AiResponse, AiUsage, BaseAIService
 
 logger = logging.getLogger(__name__)
 
 
+@cache
+def get_async_client() -> AsyncOpenAI:
+    """
+    Get the process-wide async OpenAI client with a keep-alive connection pool.
+    """
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        timeout=settings.ai.timeout,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.ai.connections,
+                max_keepalive_connections=settings.ai.keepalive,
+            ),
+        ),
+    )
+
+
+@cache
+def tool_to_openai(tool: type[BaseTool]) -> dict:
+    """
+    Build the function schema of a tool once per tool class.
+    """
+    return pydantic_function_tool(tool)
+
+
+@cache
+def tools_to_openai(tools: tuple[type[BaseTool], ...]) -> tuple[dict, ...]:
+    return tuple(tool_to_openai(tool) for tool in tools)
+
+
 class OpenAIService(BaseAIService):
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.client = OpenAI(api_key=settings.openai_api_key)
+    def __init__(self, model: str = "gpt-4o-mini", client: AsyncOpenAI | None = None):
+        self.client = client or get_async_client()
         self.model = model
+        self.usage = AiUsage()
 
     def tools_to_openai(self, tools: list[BaseTool]) -> list[dict] | None:
-        return [pydantic_function_tool(tool) for tool in tools] or None
+        return list(tools_to_openai(tuple(tools))) or None
+
+    def tool_schemas(self, tools: list[BaseTool]) -> list[dict]:
+        return list(tools_to_openai(tuple(tools)))
 
     def extract_tools(
         self, response: ChatCompletion, tools: list[BaseTool] | None = None
+    ) -> list[BaseTool]:
+        return self._build_tools(response.choices[0].message.tool_calls, tools)
+
+    def _build_tools(
+        self,
+        tool_calls: list[ChatCompletionMessageToolCall] | None,
+        tools: list[BaseTool] | None = None,
     ) -> list[BaseTool]:
         if tools is None:
             return []
-        if response.choices[0].message.tool_calls is None:
+        if tool_calls is None:
             return []
 
         tools_map = {tool.__name__: tool for tool in tools}
 
         tools = []
-        for tool in response.choices[0].message.tool_calls:
+        for tool in tool_calls:
             tool_cls = tools_map.get(tool.function.name)
             if tool_cls is None:
                 continue
@@ -49,18 +98,105 @@ class OpenAIService(BaseAIService):
                 continue
 
         return tools
-    
+
+    def extract_usage(self, response: ChatCompletion | ChatCompletionChunk) -> AiUsage | None:
+        if response.usage is None:
+            return None
+        details = response.usage.prompt_tokens_details
+        return AiUsage(
+            prompt_tokens=response.usage.prompt_tokens,
+            completion_tokens=response.usage.completion_tokens,
+            cached_tokens=(details and details.cached_tokens) or 0,
+        )
+
+    def record_usage(self, usage: AiUsage | None) -> None:
+        if usage is None:
+            return
+        self.usage.add(usage)
+        logger.info(
+            f"{self.model} usage: prompt {usage.prompt_tokens} "
+            f"(cached {usage.cached_tokens}, {usage.cached_ratio:.0%}), "
+            f"completion {usage.completion_tokens}; "
+            f"total cached {self.usage.cached_ratio:.0%}"
+        )
+
     async def generate_response(
         self, messages: list[dict], tools: list[BaseTool]
     ) -> AiResponse:
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model,
             messages=messages,
             tools=self.tools_to_openai(tools),
             tool_choice="auto",
         )
 
+        usage = self.extract_usage(response)
+        self.record_usage(usage)
         return AiResponse(
             response=response.choices[0].message.content,
             tools=self.extract_tools(response, tools),
+            usage=usage,
+        )
+
+    async def stream_response(
+        self,
+        messages: list[dict],
+        tools: list[BaseTool],
+        listener: BaseStreamListener,
+    ) -> AiResponse:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            tools=self.tools_to_openai(tools),
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        content = []
+        tool_calls: dict[int, dict] = {}
+        usage = None
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = self.extract_usage(chunk)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                await listener.on_content(delta.content)
+            for tool_delta in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(
+                    tool_delta.index, {"id": None, "name": "", "arguments": ""}
+                )
+                if tool_delta.id:
+                    tool_call["id"] = tool_delta.id
+                if tool_delta.function is not None:
+                    tool_call["name"] += tool_delta.function.name or ""
+                    tool_call["arguments"] += tool_delta.function.arguments or ""
+                await listener.on_tool_call(
+                    index=tool_delta.index,
+                    call_id=tool_call["id"],
+                    name=tool_call["name"],
+                    arguments=tool_call["arguments"],
+                )
+
+        self.record_usage(usage)
+        return AiResponse(
+            response="".join(content) or None,
+            tools=self._build_tools(
+                [
+                    ChatCompletionMessageToolCall(
+                        id=tool_call["id"],
+                        type="function",
+                        function=Function(
+                            name=tool_call["name"], arguments=tool_call["arguments"]
+                        ),
+                    )
+                    for _, tool_call in sorted(tool_calls.items())
+                ]
+                or None,
+                tools,
+            ),
+            usage=usage,
         )
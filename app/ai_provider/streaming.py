@@ -0,0 +1,95 @@
+"""
+Helpers for streamed AI responses.
+"""
+
+import json
+import re
+from abc import ABC, abstractmethod
+
+# An incomplete unicode escape at the end of a streamed string
+PARTIAL_UNICODE_RE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+class BaseStreamListener(ABC):
+    """
+    Receives tool calls while their arguments are still being generated.
+    """
+
+    async def on_content(self, content: str) -> None:
+        """
+        Called on every streamed chunk of the response text.
+        """
+
+    @abstractmethod
+    async def on_tool_call(
+        self, index: int, call_id: str | None, name: str, arguments: str
+    ) -> None:
+        """
+        Called on every streamed chunk of tool call arguments.
+
+        Args:
+            index (int): Position of the tool call in the response.
+            call_id (str): ID of the tool call.
+            name (str): Name of the called tool.
+            arguments (str): The (possibly incomplete) JSON arguments so far.
+        """
+
+
+class StreamRecorder(BaseStreamListener):
+    """
+    Keeps the text and tool call arguments generated so far.
+    """
+
+    def __init__(self):
+        self._content: list[str] = []
+        # Tool call index -> arguments streamed so far
+        self._arguments: dict[int, str] = {}
+
+    @property
+    def streamed(self) -> str:
+        """Text and tool call arguments generated so far."""
+        return "".join(self._content) + "".join(self._arguments.values())
+
+    async def on_content(self, content: str) -> None:
+        self._content.append(content)
+
+    async def on_tool_call(
+        self, index: int, call_id: str | None, name: str, arguments: str
+    ) -> None:
+        self._arguments[index] = arguments
+
+
+def partial_json_string(arguments: str, key: str) -> str | None:
+    """
+    Decode the value of a top level string field from incomplete JSON.
+
+    Returns None while the field has not started yet.
+    """
+    match = re.search(rf'[{{,]\s*"{re.escape(key)}"\s*:\s*"', arguments)
+    if match is None:
+        return None
+    start = end = match.end()
+    escaped = False
+    while end < len(arguments):
+        char = arguments[end]
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            break
+        end += 1
+    value = arguments[start:end]
+    if escaped:
+        value = value[:-1]
+    else:
+        match = PARTIAL_UNICODE_RE.search(value)
+        if match is not None:
+            before = value[: match.start()]
+            # The backslash is not itself escaped
+            if (len(before) - len(before.rstrip("\\"))) % 2 == 0:
+                value = before
+    try:
+        return json.loads(f'"{value}"')
+    except json.JSONDecodeError:
+        return None
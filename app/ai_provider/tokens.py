@@ -0,0 +1,58 @@
+"""
+Offline token estimation of conversation entries.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from functools import cache
+
+from app.config import settings
+
+# Tokens spent by the chat format on every entry (role, separators)
+ENTRY_OVERHEAD = 4
+
+
+class BaseTokenEstimator(ABC):
+    """
+    Estimates how many prompt tokens conversation entries take.
+    """
+
+    name: str
+
+    @abstractmethod
+    def estimate_text(self, text: str) -> int:
+        pass
+
+    def estimate_entries(self, entries: list[dict]) -> int:
+        tokens = 0
+        for entry in entries:
+            tokens += ENTRY_OVERHEAD
+            content = entry.get("content")
+            if content:
+                tokens += self.estimate_text(content)
+            tool_calls = entry.get("tool_calls")
+            if tool_calls:
+                tokens += self.estimate_text(json.dumps(tool_calls))
+        return tokens
+
+
+class CharsTokenEstimator(BaseTokenEstimator):
+    """
+    Estimate tokens from the text length, without a tokenizer.
+    """
+
+    name = "chars"
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+
+    def estimate_text(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+
+@cache
+def get_token_estimator() -> BaseTokenEstimator:
+    """
+    Get the process-wide token estimator.
+    """
+    return CharsTokenEstimator(settings.ai.chars)
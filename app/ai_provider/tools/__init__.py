@@ -13,9 +13,17 @@ TOOLS: list[BaseTool] = [
 ]
 
 
+# Tool filters depend on the chat type only, so the result is kept per type
+_tools_by_chat_type: dict = {}
+
+
 def get_tools(context: dict) -> list[BaseTool]:
-    return [
-        tool
-        for tool in TOOLS
-        if tool.filter(context)
-    ]
+    chat_type = context["chat"].type
+    tools = _tools_by_chat_type.get(chat_type)
+    if tools is None:
+        tools = _tools_by_chat_type[chat_type] = [
+            tool
+            for tool in TOOLS
+            if tool.filter(context)
+        ]
+    return tools
@@ -1,10 +1,22 @@
 import inspect
-from typing import Any
+from typing import Any, ClassVar
 from pydantic import BaseModel, PrivateAttr
 
 
 class BaseTool(BaseModel):
     __name__: str
+    # Calls of order sensitive tools in one turn run one after another
+    order_sensitive: ClassVar[bool] = False
+    # Parameters of __call__ (None when it takes **kwargs), set per subclass
+    __call_params__: ClassVar[frozenset[str] | None] = None
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        spec = inspect.getfullargspec(cls.__call__)
+        cls.__call_params__ = (
+            None if spec.varkw is not None else frozenset((*spec.args, *spec.kwonlyargs))
+        )
 
     _extra_payload: dict = PrivateAttr(default_factory=dict)
 
@@ -20,11 +32,8 @@ class BaseTool(BaseModel):
         return await self(**kwargs)
 
     def _prepare_kwargs(self, kwargs: dict) -> dict:
-        spec = inspect.getfullargspec(self.__call__)
-        params = {*spec.args, *spec.kwonlyargs}
-        varkw = spec.varkw is not None
-
-        if varkw:
+        params = self.__call_params__
+        if params is None:
             return kwargs
 
         return {k: kwargs[k] for k in params if k in kwargs}
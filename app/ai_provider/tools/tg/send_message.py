@@ -1,7 +1,9 @@
+from contextlib import suppress
 from pydantic import BaseModel
-from typing import Literal
+from typing import ClassVar, Literal
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
 from aiogram.methods import SendMessage as SendMessageMethod
 from aiogram.types import (
     ReplyParameters,
@@ -12,6 +14,8 @@ from aiogram.types import (
     ReplyKeyboardRemove,
 )
 
+from app.db import DBReposContext, MessageType
+
 from ..base import BaseTool
 
 
@@ -26,13 +30,38 @@ class SendMessage(BaseTool):
   <tg-spoiler>, <a href="http://www.example.com/">, <a href="tg://user?id=123456789">, <tg-emoji emoji-id="5368324170671202286">,
   <b>,<strong>, <i>, <em>, <u>, <ins>, <s>, <strike>, <del>, <span class="tg-spoiler">"""
 
+    order_sensitive: ClassVar[bool] = True
+
     text: str
     reply_to_message_id: int | None = None
     reply_quote: str | None = None
     keyboard: list[list[str]] | Literal["REMOVE"] | None = None
     inline_keyboard: list[list[Button]] | None = None
 
-    async def __call__(self, bot: Bot, chat_id: int):
+    async def __call__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        db: DBReposContext,
+        streamed_messages: dict[str, int] | None = None,
+    ):
+        # Finalize the preview sent while the response was streaming
+        preview_id = (streamed_messages or {}).pop(self.extra_payload.get("id"), None)
+        if preview_id is not None:
+            if self._can_edit() and await self._edit_preview(bot, chat_id, preview_id):
+                # The preview was sent with no_save, saved here like SaveSendMsg does
+                await db.message.create_message(
+                    telegram_id=preview_id,
+                    chat_id=chat_id,
+                    from_user_id=bot.id,
+                    type=MessageType.TEXT,
+                    content=self.text,
+                    wait=False,
+                )
+                return {"message_id": preview_id}
+            with suppress(TelegramAPIError):
+                await bot.delete_message(chat_id=chat_id, message_id=preview_id)
+
         message = await bot(
             SendMessageMethod(
                 chat_id=chat_id,
@@ -49,6 +78,24 @@ class SendMessage(BaseTool):
         )
         return {"message_id": message.message_id}
 
+    async def _edit_preview(self, bot: Bot, chat_id: int, preview_id: int) -> bool:
+        """Replace the preview with the final message, False when it failed."""
+        try:
+            await bot.edit_message_text(
+                text=self.text,
+                chat_id=chat_id,
+                message_id=preview_id,
+                parse_mode="HTML",
+                reply_markup=self._get_keyboard(),
+            )
+        except TelegramBadRequest as e:
+            return "message is not modified" in e.message
+        return True
+
+    def _can_edit(self) -> bool:
+        # Replies and reply keyboards can not be added by editing a message
+        return self.reply_to_message_id is None and self.keyboard is None
+
     def _get_keyboard(self) -> InlineKeyboardMarkup | ReplyKeyboardMarkup | None:
         if self.keyboard == "REMOVE":
             return ReplyKeyboardRemove()
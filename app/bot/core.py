@@ -8,7 +8,7 @@ from aiogram import Bot, Dispatcher
 from aiogram.utils.token import TokenValidationError
 
 from app.config import settings
-from app.db import get_async_session
+from app.db import dispose_async_engine
 from app.db import DBReposContext
 
 from .handlers import index_router
@@ -18,7 +18,7 @@ from .session_utils import SessionUtils
 logger = getLogger(__name__)
 
 bot: Bot | None = None 
-db_repo_context = DBReposContext(get_async_session())
+db_repo_context = DBReposContext()
 try:
     bot = Bot(
         token=settings.bot_token,
@@ -44,6 +44,13 @@ async def startup(bot: Bot):
     )
 
 
+@dp.shutdown()
+async def shutdown():
+    # Write buffered messages before the connections are closed
+    if db_repo_context.buffer is not None:
+        await db_repo_context.buffer.close()
+    await dispose_async_engine()
+
 
 # Setup middleware
 dp.update.middleware(DatabaseMiddleware())
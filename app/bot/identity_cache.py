@@ -0,0 +1,79 @@
+"""
+Cache of the chats and users already persisted by the bot process.
+"""
+
+from typing import Any, Hashable, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.cache import LRUCache
+from app.config import settings
+from app.db import Chat, User
+
+T = TypeVar("T")
+
+
+class IdentityCache:
+    """
+    Remembers the last persisted fields of every chat and user by Telegram id.
+
+    When the fingerprint of an incoming chat/user equals the cached one the
+    upsert can be skipped and the cached object served instead. Column values
+    are cached, every hit gets its own (detached) instance, so concurrent
+    updates never share one.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = settings.identity.size,
+        ttl: float | None = settings.identity.ttl,
+    ):
+        self.chats: LRUCache[tuple[Hashable, dict]] = LRUCache(maxsize, ttl)
+        self.users: LRUCache[tuple[Hashable, dict]] = LRUCache(maxsize, ttl)
+
+    @staticmethod
+    def fingerprint(values: dict[str, Any]) -> Hashable:
+        return tuple(sorted(values.items()))
+
+    @staticmethod
+    def snapshot(instance: Any) -> dict[str, Any]:
+        """Column values of a persisted instance."""
+        return {
+            attr.key: getattr(instance, attr.key)
+            for attr in inspect(type(instance)).column_attrs
+        }
+
+    @staticmethod
+    def restore(model: type[T], snapshot: dict[str, Any]) -> T:
+        """A new detached instance with the snapshot values."""
+        instance = model(**snapshot)
+        make_transient_to_detached(instance)
+        return instance
+
+    def get_chat(self, values: dict[str, Any]) -> Chat | None:
+        return self._get(self.chats, Chat, values["chat_id"], values)
+
+    def set_chat(self, values: dict[str, Any], chat: Chat) -> None:
+        self.chats.set(values["chat_id"], (self.fingerprint(values), self.snapshot(chat)))
+
+    def get_user(self, values: dict[str, Any]) -> User | None:
+        return self._get(self.users, User, values["user_id"], values)
+
+    def set_user(self, values: dict[str, Any], user: User) -> None:
+        self.users.set(values["user_id"], (self.fingerprint(values), self.snapshot(user)))
+
+    def _get(
+        self, cache: LRUCache, model: type[T], key: int, values: dict[str, Any]
+    ) -> T | None:
+        cached = cache.get(key, count=False)
+        # Changed fields count as a miss, the object has to be written again
+        if cached is None or cached[0] != self.fingerprint(values):
+            cache.misses += 1
+            return None
+        cache.hits += 1
+        return self.restore(model, cached[1])
+
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {"chats": self.chats.stats, "users": self.users.stats}
@@ -13,48 +13,51 @@ from aiogram.types import (
     Message as TelegramMessage,
 )
 from aiogram.fsm.middleware import EVENT_CONTEXT_KEY, EventContext
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.db import DBReposContext
-from app.db import Chat as DBChat, User as DBUser, Message as DBMessage
 from app.db import MessageType, ChatType
 
+from ..identity_cache import IdentityCache
+
 
 class DatabaseMiddleware(BaseMiddleware):
     """
     Middleware to manage database connections and sessions for bot interactions.
+
+    Chats and users whose fields did not change since the last write are served
+    from ``identity_cache`` instead of being upserted again.
     """
 
-    async def _resolve_db_chat(
-        self, db: DBReposContext, chat: TelegramChat | None
-    ) -> DBChat | None:
+    def __init__(self, identity_cache: IdentityCache | None = None):
+        self.identity_cache = identity_cache or IdentityCache()
+
+    def _get_chat_values(self, chat: TelegramChat | None) -> dict | None:
         if chat is None:
             return None
-        return await db.chat.create_or_update_chat(
+        return dict(
             chat_id=chat.id,
             title=chat.full_name,
             username=chat.username,
             type=ChatType(chat.type),
         )
 
-    async def _resolve_db_user(
-        self, db: DBReposContext, user: TelegramUser | None
-    ) -> DBUser | None:
+    def _get_user_values(self, user: TelegramUser | None) -> dict | None:
         if user is None:
             return None
-        return await db.user.create_or_update_user(
+        return dict(
             user_id=user.id,
             first_name=user.first_name,
             last_name=user.last_name,
             username=user.username,
         )
 
-    async def _resolve_db_message(
+    def _get_message_values(
         self,
-        db: DBReposContext,
         message: TelegramMessage | None,
         chat_id: int = None,
         user_id: int = None,
-    ) -> DBMessage | None:
+    ) -> dict | None:
         if message is None or message.html_text is None:
             return None
 
@@ -79,8 +82,8 @@ class DatabaseMiddleware(BaseMiddleware):
             })
         if message.forward_origin:
             payload["is_forwarded"] = True
-    
-        return await db.message.create_message(
+
+        return dict(
             chat_id=chat_id,
             from_user_id=user_id,
             type=MessageType.TEXT,
@@ -100,14 +103,43 @@ class DatabaseMiddleware(BaseMiddleware):
         db = DBReposContext()
 
         data["db"] = db
+        save_message = event.message is not None and "not_saved" not in extract_flags(handler)
+        chat_values = user_values = message_values = None
         if event_context is not None:
-            data["db_chat"] = await self._resolve_db_chat(db, event_context.chat)
-            data["db_user"] = await self._resolve_db_user(db, event_context.user)
-        if event.message is not None and "not_saved" not in extract_flags(handler):
-            data["db_message"] = await self._resolve_db_message(
-                db,
+            chat_values = self._get_chat_values(event_context.chat)
+            user_values = self._get_user_values(event_context.user)
+        if save_message:
+            message_values = self._get_message_values(
                 event.message,
                 chat_id=event_context.chat_id,
                 user_id=event_context.user_id,
             )
+        # Skip writes of chats and users that did not change
+        cached_chat = cached_user = None
+        if chat_values is not None:
+            cached_chat = self.identity_cache.get_chat(chat_values)
+        if user_values is not None:
+            cached_user = self.identity_cache.get_user(user_values)
+        # Persist chat, user and message in a single round trip
+        ingested = await db.ingest.ingest_update(
+            chat=chat_values if cached_chat is None else None,
+            user=user_values if cached_user is None else None,
+            message=message_values,
+            settings_chat_id=cached_chat.id if cached_chat is not None else None,
+        )
+        db_chat, db_user = ingested.chat, ingested.user
+        if cached_chat is not None:
+            db_chat = cached_chat
+            set_committed_value(db_chat, "ai_settings", ingested.settings)
+        elif db_chat is not None:
+            self.identity_cache.set_chat(chat_values, db_chat)
+        if cached_user is not None:
+            db_user = cached_user
+        elif db_user is not None:
+            self.identity_cache.set_user(user_values, db_user)
+        if event_context is not None:
+            data["db_chat"] = db_chat
+            data["db_user"] = db_user
+        if save_message:
+            data["db_message"] = ingested.message
         return await handler(event, data)
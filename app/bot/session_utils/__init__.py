@@ -1,4 +1,13 @@
 from .session import SessionUtils
-from .middlewares import SaveSendMsg
+from .middlewares import SaveSendMsg, RateLimitMiddleware
+from .rate_limit import RateLimiter, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
 
-__all__ = ["SessionUtils", "SaveSendMsg"]
+__all__ = [
+    "SessionUtils",
+    "SaveSendMsg",
+    "RateLimitMiddleware",
+    "RateLimiter",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW",
+]
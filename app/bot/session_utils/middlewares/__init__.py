@@ -1,3 +1,4 @@
 from .save_send_msg import SaveSendMsg
+from .rate_limit import RateLimitMiddleware
 
-__all__ = ["SaveSendMsg"]
+__all__ = ["SaveSendMsg", "RateLimitMiddleware"]
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendChatAction, TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+from ..rate_limit import PRIORITY_NORMAL, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Methods that post or change messages count against the limits
+LIMITED_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+STATS_INTERVAL = 60  # seconds
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware to keep sends within Telegram limits.
+
+    Sends wait for the rate limiter (priority taken from the ``priority``
+    extra of the method) and are retried after ``retry_after`` on flood waits.
+    """
+
+    def __init__(self, limiter: RateLimiter, retries: int = 3):
+        self.limiter = limiter
+        self.retries = retries
+        self._logged_at = time.monotonic()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not self._is_limited(method):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = (method.model_extra or {}).get("priority", PRIORITY_NORMAL)
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire(chat_id, priority)
+            self._log_stats()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.retries:
+                    raise
+                self.limiter.retries += 1
+                logger.warning(
+                    f"Flood wait {e.retry_after}s for chat {chat_id} on {type(method).__name__}"
+                )
+                self.limiter.pause(chat_id, e.retry_after)
+
+    def _is_limited(self, method: TelegramMethod) -> bool:
+        return type(method).__name__.startswith(LIMITED_PREFIXES) and not isinstance(
+            method, SendChatAction
+        )
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._logged_at >= STATS_INTERVAL:
+            self._logged_at = now
+            logger.info(f"Send rate limiter: {self.limiter.stats}")
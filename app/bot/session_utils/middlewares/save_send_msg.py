@@ -32,14 +32,22 @@ class SaveSendMsg(BaseRequestMiddleware):
             return response
         method: SendMessage
 
+        payload = None
+        reply_to_message_id = method.reply_to_message_id or (
+            method.reply_parameters and method.reply_parameters.message_id
+        )
+        if reply_to_message_id:
+            payload = {"reply_to": {"id": reply_to_message_id, "type": "reply"}}
+
         await self.message_repo.create_message(
             telegram_id=response.message_id,
 
             chat_id=method.chat_id,
             from_user_id=bot.id,
-            reply_to_id=method.reply_to_message_id,
 
             type=MessageType.TEXT,
             content=method.text,
-            payload=None,
+            payload=payload,
+            wait=False,
         )
+        return response
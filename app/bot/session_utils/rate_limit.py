@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from app.cache import LRUCache
+from app.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token can be taken."""
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    Grants sends in priority order within a global and a per-chat token bucket.
+
+    A waiting send for a chat whose bucket is empty does not block sends to
+    other chats.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        private: float,
+        group: float,
+        burst: float = 1,
+        chats: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(rate, rate)
+        self.private = private
+        self.group = group
+        self.burst = burst
+        # Evicted buckets are the idle ones, which are full anyway
+        self.chat_buckets: LRUCache[TokenBucket] = LRUCache(chats)
+        self.wait_time = Histogram()
+        self.retries = 0
+        self._queue: list[list] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "retries": self.retries,
+            "wait": self.wait_time.stats,
+        }
+
+    def get_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id, count=False)
+        if bucket is None:
+            # Negative ids are groups and channels
+            rate = self.private if isinstance(chat_id, int) and chat_id > 0 else self.group
+            bucket = TokenBucket(rate, self.burst)
+            self.chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    def pause(self, chat_id: int | str | None, seconds: float) -> None:
+        """Stop granting sends to the chat (or all chats) for a while."""
+        bucket = self.global_bucket if chat_id is None else self.get_bucket(chat_id)
+        bucket.pause(seconds)
+        self._wakeup.set()
+
+    async def acquire(
+        self, chat_id: int | str | None, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        """
+        Wait until a send to the chat is allowed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue,
+            [priority, next(self._counter), chat_id, future, time.monotonic()],
+        )
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        # A cancelled waiter cancels its future, the dispatcher skips it
+        await future
+
+    async def _run(self) -> None:
+        while self._queue:
+            self._wakeup.clear()
+            delay = self._grant()
+            if not self._queue:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant(self) -> float | None:
+        """
+        Grant every send that is allowed now, return seconds until the next one.
+        """
+        now = time.monotonic()
+        next_delay = None
+        waiting = []
+        blocked_chats = set()
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            priority, _, chat_id, future, queued_at = entry
+            if future.done():
+                continue
+            global_delay = self.global_bucket.delay(now)
+            if global_delay > 0:
+                waiting.append(entry)
+                next_delay = global_delay if next_delay is None else min(next_delay, global_delay)
+                break
+            chat_delay = 0.0
+            if chat_id is not None:
+                # Sends to one chat keep their priority order
+                chat_delay = (
+                    float("inf") if chat_id in blocked_chats
+                    else self.get_bucket(chat_id).delay(now)
+                )
+            if chat_delay > 0:
+                waiting.append(entry)
+                if chat_id not in blocked_chats:
+                    blocked_chats.add(chat_id)
+                    next_delay = chat_delay if next_delay is None else min(next_delay, chat_delay)
+                continue
+            self.global_bucket.take(now)
+            if chat_id is not None:
+                self.get_bucket(chat_id).take(now)
+            self.wait_time.observe(now - queued_at)
+            future.set_result(None)
+        for entry in waiting:
+            heapq.heappush(self._queue, entry)
+        return next_delay
@@ -1,10 +1,20 @@
 from aiogram.client.session.aiohttp import AiohttpSession
 
+from app.config import settings
 from app.db import MessageRepository
-from .middlewares import SaveSendMsg
+from .middlewares import RateLimitMiddleware, SaveSendMsg
+from .rate_limit import RateLimiter
 
 class SessionUtils(AiohttpSession):
     def __init__(self, message_repo: MessageRepository, proxy: str | None = None, limit: int = 100, **kwargs) -> None:
         super().__init__(proxy=proxy, limit=limit, **kwargs)
         self._message_repo = message_repo
+        self.limiter = RateLimiter(
+            rate=settings.limits.rate,
+            private=settings.limits.private,
+            group=settings.limits.group,
+            burst=settings.limits.burst,
+        )
         self.middleware.register(SaveSendMsg(self._message_repo))
+        # Inside SaveSendMsg, so a message is saved once it is actually sent
+        self.middleware.register(RateLimitMiddleware(self.limiter, settings.limits.retries))
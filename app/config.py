@@ -4,7 +4,7 @@ Configuration management using Pydantic v2 settings.
 
 import logging
 import secrets
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import (
     AmqpDsn,
@@ -20,6 +20,25 @@ from sqlalchemy import URL
 logging.basicConfig(level=logging.INFO)
 
 
+class DatabasePoolSettings(BaseModel):
+    """Database connection pool settings."""
+
+    size: int = Field(10)
+    overflow: int = Field(20)
+    recycle: int = Field(1800)
+    timeout: float = Field(30.0)
+    statements: int = Field(100)
+
+
+class WriteBufferSettings(BaseModel):
+    """Write-behind batching of message inserts."""
+
+    enabled: bool = Field(False)
+    # Seconds a row may wait for its batch and rows per batch
+    delay: float = Field(0.005)
+    size: int = Field(500)
+
+
 class DatabaseSettings(BaseModel):
     """Database configuration settings."""
 
@@ -29,6 +48,9 @@ class DatabaseSettings(BaseModel):
     password: str = Field("postgres")
     name: str = Field("postgres")
 
+    pool: DatabasePoolSettings = DatabasePoolSettings()
+    buffer: WriteBufferSettings = WriteBufferSettings()
+
     @property
     def url(self) -> str:
         """Construct the full database connection URL."""
@@ -42,6 +64,112 @@ class DatabaseSettings(BaseModel):
         ).render_as_string(False)
 
 
+class AIProviderSettings(BaseModel):
+    """AI provider HTTP client settings."""
+
+    connections: int = Field(100)
+    keepalive: int = Field(20)
+    timeout: float = Field(60.0)
+    # Memoized rendered conversation entries
+    renders: int = Field(20000)
+    # Prompt token budget (system prompt, tool schemas, history), per model overrides
+    budget: int = Field(16000)
+    budgets: dict[str, int] = Field({})
+    # Messages fetched per page while filling the budget
+    page: int = Field(50)
+    # Characters per token of the offline estimator
+    chars: float = Field(4.0)
+    # Deliver messages while they are generated
+    stream: bool = Field(True)
+
+
+class IdentityCacheSettings(BaseModel):
+    """Bot cache of already persisted chats and users."""
+
+    size: int = Field(10000)
+    ttl: float = Field(600.0)
+
+
+class NotifySettings(BaseModel):
+    """Change notification channel between the bot and the worker."""
+
+    backend: Literal["postgres", "amqp", "memory", "none"] = Field("postgres")
+    # Postgres triggers notify the channel set when the migrations ran
+    channel: str = Field("gptalk_changes")
+    amqp: AmqpDsn | None = Field(None)
+    poll: float = Field(30.0)
+
+
+class WorkerSettings(BaseModel):
+    """Chat worker settings."""
+
+    concurrency: int = Field(32)
+    # Deadline of the tool calls of one AI response
+    tools: float = Field(30.0)
+    # Minimal seconds between edits of a streamed message
+    edits: float = Field(1.0)
+    # Restarts of a generation made stale by new messages
+    restarts: int = Field(3)
+    # Chats with their AI settings kept in memory, refreshed by the change scan
+    chats: int = Field(10000)
+    ttl: float = Field(600.0)
+    # Seconds without activity before an unscheduled chat is dropped from memory,
+    # also how far back the startup scan looks
+    idle: float = Field(3600.0)
+    # Shard chats between several worker replicas
+    sharding: bool = Field(False)
+    shards: int = Field(64)
+    lease: float = Field(30.0)
+    heartbeat: float = Field(10.0)
+
+
+class SummarySettings(BaseModel):
+    """Rolling summary of the history older than the context window."""
+
+    # Summarize once this many messages fell out of the window, 0 disables
+    every: int = Field(50)
+    # Maximum messages summarized per update
+    batch: int = Field(200)
+
+
+class RecallSettings(BaseModel):
+    """Retrieval of older relevant messages from a local vector index."""
+
+    # "openai:<model>:<dimensions>" or "hashing:<dimensions>", empty disables
+    embedder: str = Field("")
+    path: str = Field("data/vectors")
+    # Messages recalled per turn and their token budget
+    k: int = Field(5)
+    budget: int = Field(1000)
+    # Messages embedded per request
+    batch: int = Field(64)
+    # Newest messages of the window averaged into the query
+    query: int = Field(3)
+
+
+class RateLimitSettings(BaseModel):
+    """Outbound Telegram send limits."""
+
+    # Sends per second, globally and per private chat / group
+    rate: float = Field(30.0)
+    private: float = Field(1.0)
+    group: float = Field(20 / 60)
+    # Sends a chat may burst before its rate applies
+    burst: float = Field(1.0)
+    # Retries of a send after a flood wait
+    retries: int = Field(3)
+
+
+class ScheduledSettings(BaseModel):
+    """Delivery of scheduled notifications."""
+
+    # Seconds of upcoming notifications kept in memory and their maximum count
+    window: float = Field(3600.0)
+    size: int = Field(1000)
+    # Notifications delivered per transaction
+    batch: int = Field(100)
+
+
 class Settings(BaseSettings):
     """Main application settings."""
 
@@ -56,6 +184,14 @@ class Settings(BaseSettings):
     openai_api_key: str = Field("")
 
     database: DatabaseSettings = DatabaseSettings()
+    ai: AIProviderSettings = AIProviderSettings()
+    identity: IdentityCacheSettings = IdentityCacheSettings()
+    notify: NotifySettings = NotifySettings()
+    worker: WorkerSettings = WorkerSettings()
+    summary: SummarySettings = SummarySettings()
+    recall: RecallSettings = RecallSettings()
+    limits: RateLimitSettings = RateLimitSettings()
+    scheduled: ScheduledSettings = ScheduledSettings()
 
 
 # Create a singleton settings instance
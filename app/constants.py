@@ -8,9 +8,6 @@ Answer only new messages, if you have old messages, you should not answer.
 {user_instructions}
 </user_instructions>
 
-<current_time>
-UTC: {current_time}
-</current_time>
 <chat id="{chat_id}">
     <chat_type>{chat_type}</chat_type>
     <chat_title>{chat_title}</chat_title>
@@ -18,6 +15,38 @@ UTC: {current_time}
 </chat>
 """
 
+SUMMARY_IN_CHAT = """
+<history_summary>
+{summary}
+</history_summary>
+"""
+
+RECALLED_IN_CHAT = """
+<recalled_messages>
+Older messages of this chat related to the latest ones:
+{messages}
+</recalled_messages>
+"""
+
+SUMMARY_PROMPT = """
+You maintain a rolling summary of a Telegram chat for an assistant that only sees the latest messages.
+Update <previous_summary> with the new messages: keep facts, decisions, user preferences, open questions and who is who.
+Drop small talk. Reply with the updated summary only, in the language of the chat, at most a few paragraphs.
+
+<previous_summary>
+{summary}
+</previous_summary>
+"""
+
+# Volatile data goes to the end of the conversation, so the prompt prefix
+# (tools, BASE_PROMPT, history) stays byte-identical between turns
+CURRENT_TIME_PROMPT = """
+<current_time>
+UTC: {current_time}
+</current_time>
+"""
+CURRENT_TIME_GRANULARITY = 60  # seconds
+
 SHORT_USER_IN_CHAT = """
 <{tag} id="{user_id}" />
 """
@@ -61,3 +90,4 @@ NOTIFICATION_MESSAGE_IN_CHAT = """
 """
 
 NOT_RESPONSE_TOOL_MESSAGE = "**Tool call empty response**"
+TIMEOUT_TOOL_MESSAGE = "**Tool call timed out**"
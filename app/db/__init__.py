@@ -2,8 +2,8 @@
 Database module.
 """
 
-from .conn import get_async_engine, get_async_session
-from .models import Base, User, Message, Chat, ChatAISettings, MessageType, ChatType, Scheduled
+from .conn import get_async_engine, get_async_session, dispose_async_engine
+from .models import Base, User, Message, Chat, ChatAISettings, MessageType, ChatType, Scheduled, ChatSummary
 from .repos import BaseRepository, UserRepository, MessageRepository, ChatRepository
 from .context import DBReposContext
 
@@ -12,11 +12,13 @@ __all__ = [
     "BaseRepository",
     "get_async_session",
     "get_async_engine",
+    "dispose_async_engine",
     "DBReposContext",
     "User",
     "Message",
     "Chat",
     "ChatAISettings",
+    "ChatSummary",
     "UserRepository",
     "MessageRepository",
     "ChatRepository",
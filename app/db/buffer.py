@@ -0,0 +1,168 @@
+"""
+Write-behind buffer of message inserts.
+"""
+
+import asyncio
+import logging
+import time
+from functools import cache
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.metrics import Histogram
+
+from .conn import get_async_session
+from .models import Message
+from .notify import MESSAGE, BaseChangeNotifier, ChangeEvent, get_change_notifier
+
+logger = logging.getLogger(__name__)
+
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+STATS_INTERVAL = 60  # seconds
+# Attempts of a failed batch and the delay before the first retry (doubled each time)
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.5  # seconds
+
+
+class MessageWriteBuffer:
+    """
+    Collects message rows and inserts them in batches.
+
+    Rows get their (time-ordered) ids on the client, so the order of messages
+    does not depend on when a batch is flushed. A batch is written once
+    ``delay`` seconds passed since its first row or when it holds ``size``
+    rows, as one multi-row insert in one transaction.
+    """
+
+    def __init__(
+        self,
+        async_session: async_sessionmaker,
+        notifier: BaseChangeNotifier,
+        delay: float = 0.005,
+        size: int = 500,
+    ):
+        self.async_session = async_session
+        self.notifier = notifier
+        self.delay = delay
+        self.size = size
+        self.flush_time = Histogram()
+        self.batch_size = Histogram(BATCH_BUCKETS)
+        self._rows: list[dict] = []
+        self._futures: list[asyncio.Future] = []
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._logged_at = time.monotonic()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._rows),
+            "flush_time": self.flush_time.stats,
+            "batch_size": self.batch_size.stats,
+        }
+
+    def add(self, row: dict) -> asyncio.Future:
+        """
+        Queue a row, the returned future resolves to the inserted message.
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Failures are logged here, callers that do not wait ignore them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._rows.append(row)
+        self._futures.append(future)
+        if len(self._rows) >= self.size:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    async def flush(self) -> None:
+        """
+        Barrier: wait until every row queued so far is written.
+
+        The writer task runs until no rows are left, waiting for it also
+        covers the batch it is writing right now.
+        """
+        task = self._task
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    async def close(self) -> None:
+        await self.flush()
+
+    async def _run(self) -> None:
+        while self._rows:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.delay)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            rows, self._rows = self._rows[: self.size], self._rows[self.size :]
+            futures, self._futures = (
+                self._futures[: self.size],
+                self._futures[self.size :],
+            )
+            if len(self._rows) >= self.size:
+                self._full.set()
+            await self._write(rows, futures)
+
+    async def _write(self, rows: list[dict], futures: list[asyncio.Future]) -> None:
+        started = time.monotonic()
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                messages = await self._insert(rows)
+                break
+            except Exception as e:
+                if attempt + 1 < WRITE_ATTEMPTS:
+                    logger.warning(
+                        f"Error writing {len(rows)} buffered messages, retrying: {e}"
+                    )
+                    await asyncio.sleep(RETRY_DELAY * 2**attempt)
+                    continue
+                logger.exception(f"Error writing {len(rows)} buffered messages: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        self.flush_time.observe(time.monotonic() - started)
+        self.batch_size.observe(len(rows))
+        for future, message in zip(futures, messages):
+            if not future.done():
+                future.set_result(message)
+        await self.notifier.publish(
+            *(ChangeEvent(MESSAGE, row["chat_id"], row["type"].name) for row in rows)
+        )
+        self._log_stats()
+
+    async def _insert(self, rows: list[dict]) -> list[Message]:
+        async with self.async_session() as session:
+            result = await session.execute(
+                insert(Message).returning(Message, sort_by_parameter_order=True),
+                rows,
+            )
+            messages = result.scalars().all()
+            await session.commit()
+            return messages
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._logged_at >= STATS_INTERVAL:
+            self._logged_at = now
+            logger.info(f"Message write buffer: {self.stats}")
+
+
+@cache
+def get_message_buffer() -> MessageWriteBuffer | None:
+    """
+    Get the process-wide message write buffer, None when it is disabled.
+    """
+    if not settings.database.buffer.enabled:
+        return None
+    return MessageWriteBuffer(
+        get_async_session(),
+        get_change_notifier(),
+        delay=settings.database.buffer.delay,
+        size=settings.database.buffer.size,
+    )
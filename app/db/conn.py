@@ -1,5 +1,8 @@
 """
 Database connection module.
+
+The engine (and its connection pool) and the session maker are created
+lazily once per process and shared by every repository context.
 """
 
 from functools import cache
@@ -14,23 +17,45 @@ from sqlalchemy.ext.asyncio import (
 from app.config import settings
 
 
+@cache
 def get_async_engine(url: str = settings.database.url) -> AsyncEngine:
     """
-    Get an async engine for the database.
+    Get the shared async engine for the database.
     """
-    return create_async_engine(url)
+    pool = settings.database.pool
+    return create_async_engine(
+        url,
+        pool_size=pool.size,
+        max_overflow=pool.overflow,
+        pool_recycle=pool.recycle,
+        pool_timeout=pool.timeout,
+        pool_pre_ping=True,
+        connect_args={"statement_cache_size": pool.statements},
+    )
 
 
+@cache
+def _get_default_async_session() -> async_sessionmaker:
+    return async_sessionmaker(
+        get_async_engine(), expire_on_commit=False, class_=AsyncSession
+    )
+
 
 def get_async_session(engine: AsyncEngine | None = None) -> async_sessionmaker:
     """
-    Get an async session for the database.
+    Get an async session maker for the database.
+
+    Without an explicit engine the shared, process-wide session maker is returned.
     """
     if engine is None:
-        engine = get_async_engine()
+        return _get_default_async_session()
+
+    return async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
-    async_session = async_sessionmaker(
-        engine, expire_on_commit=False, class_=AsyncSession
-    )
 
-    return async_session
\ No newline at end of file
+async def dispose_async_engine() -> None:
+    """
+    Close every pooled connection of the shared engine.
+    """
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
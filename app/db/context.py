@@ -4,8 +4,18 @@ Middleware for managing context in Telegram bot interactions.
 
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from .repos import ChatRepository, MessageRepository, UserRepository, ScheduledRepo
+from .repos import (
+    ChatRepository,
+    MessageRepository,
+    UserRepository,
+    ScheduledRepo,
+    IngestRepository,
+    LeaseRepository,
+    SummaryRepository,
+)
+from .buffer import get_message_buffer
 from .conn import get_async_session
+from .notify import BaseChangeNotifier, get_change_notifier
 
 
 class DBReposContext:
@@ -13,9 +23,21 @@ class DBReposContext:
     Middleware to handle and maintain context during bot interactions.
     """
 
-    def __init__(self, session_maker: async_sessionmaker | None = None):
+    def __init__(
+        self,
+        session_maker: async_sessionmaker | None = None,
+        notifier: BaseChangeNotifier | None = None,
+    ):
+        # The process-wide write buffer only serves the default session maker
+        self.buffer = get_message_buffer() if session_maker is None else None
         self.async_session = session_maker or get_async_session()
-        self.user = UserRepository(self.async_session)
-        self.chat = ChatRepository(self.async_session)
-        self.message = MessageRepository(self.async_session)
-        self.scheduled = ScheduledRepo(self.async_session)
+        self.notifier = notifier or get_change_notifier()
+        self.user = UserRepository(self.async_session, self.notifier)
+        self.chat = ChatRepository(self.async_session, self.notifier)
+        self.message = MessageRepository(
+            self.async_session, self.notifier, self.buffer
+        )
+        self.scheduled = ScheduledRepo(self.async_session, self.notifier)
+        self.ingest = IngestRepository(self.async_session, self.notifier)
+        self.lease = LeaseRepository(self.async_session, self.notifier)
+        self.summary = SummaryRepository(self.async_session, self.notifier)
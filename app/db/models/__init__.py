@@ -10,5 +10,21 @@ from .user import User
 from .chat_ai_settings import ChatAISettings
 from .messages import Message, MessageType
 from .scheduled import Scheduled
+from .chat_summary import ChatSummary
+from .worker_lease import WorkerHeartbeat, ShardLease
+from .ids import uuid7
 
-__all__ = ["Base", "User", "Chat", "ChatType", "ChatAISettings", "Message", "MessageType", "Scheduled"]
+__all__ = [
+    "Base",
+    "User",
+    "Chat",
+    "ChatType",
+    "ChatAISettings",
+    "Message",
+    "MessageType",
+    "Scheduled",
+    "ChatSummary",
+    "WorkerHeartbeat",
+    "ShardLease",
+    "uuid7",
+]
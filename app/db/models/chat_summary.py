@@ -0,0 +1,16 @@
+from sqlalchemy import UUID, BigInteger, Column, ForeignKey, String
+
+from .base import Base, TimestampMixin
+
+
+class ChatSummary(Base, TimestampMixin):
+    """
+    Rolling summary of the older history of a chat.
+    """
+
+    __tablename__ = "chat_summaries"
+
+    chat_id = Column(BigInteger, ForeignKey("chats.id"), primary_key=True)
+    content = Column(String, nullable=False)
+    # Newest message covered by the summary
+    last_message_id = Column(UUID, nullable=False)
@@ -0,0 +1,36 @@
+"""
+Time-ordered identifiers for primary keys.
+"""
+
+import os
+import time
+import uuid
+
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a UUIDv7 (RFC 9562).
+
+    The first 48 bits are the unix time in milliseconds, so new rows are
+    appended to the right edge of the primary key index. Within one
+    millisecond ``rand_a`` is used as a counter, which keeps the ids of one
+    process strictly increasing (also when the clock steps back).
+    """
+    global _last_ms, _counter
+    now_ms = time.time_ns() // 1_000_000
+    if now_ms > _last_ms:
+        _last_ms = now_ms
+        # Random start leaves room for at least 2048 ids in the millisecond
+        _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+    else:
+        _counter += 1
+        if _counter > 0xFFF:
+            _last_ms += 1
+            _counter = 0
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(
+        int=(_last_ms << 80) | (0x7 << 76) | (_counter << 64) | (0b10 << 62) | rand_b
+    )
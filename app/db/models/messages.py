@@ -9,12 +9,16 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     JSON,
     String,
+    desc,
+    func,
 )
 from sqlalchemy.orm import relationship
 
 from .base import Base, TimestampMixin
+from .ids import uuid7
 
 if TYPE_CHECKING:
     from .chat import Chat
@@ -36,8 +40,17 @@ class MessageType(PyEnum):
 
 class Message(Base, TimestampMixin):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Last messages of a chat (MessageRepository.get_last_messages)
+        Index("ix_messages_chat_id_id", "chat_id", desc("id")),
+        # New messages scan of the worker (ChatRepository.get_awaible_new_messages_in_chats)
+        Index("ix_messages_created_at", "created_at"),
+    )
 
-    id: int = Column(UUID, primary_key=True, default=uuid.uuid4)
+    # Time-ordered, so ordering by id is ordering by creation time
+    id: uuid.UUID = Column(
+        UUID, primary_key=True, default=uuid7, server_default=func.uuid_generate_v7()
+    )
 
     type: MessageType = Column(
         Enum(MessageType), nullable=False, default=MessageType.TEXT
@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UUID
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UUID, Index, text, func
 from sqlalchemy.orm import relationship
 
-import uuid
-
 from .base import Base, TimestampMixin
+from .ids import uuid7
 
 
 class Scheduled(Base, TimestampMixin):
     __tablename__ = 'scheduled'
+    __table_args__ = (
+        # Pending notifications (ScheduledRepo.get_pending, deliver_due)
+        Index('ix_scheduled_date_not_done', 'date', postgresql_where=text('NOT is_done')),
+    )
 
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(UUID, primary_key=True, default=uuid7, server_default=func.uuid_generate_v7())
 
     message = Column(String, nullable=False)
     date = Column(DateTime, nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import TIMESTAMP, Column, Integer, String, func
+
+from .base import Base
+
+
+class WorkerHeartbeat(Base):
+    """
+    Last heartbeat of a running chat worker instance.
+    """
+
+    __tablename__ = "worker_heartbeats"
+
+    worker_id = Column(String, primary_key=True)
+    heartbeat_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+
+class ShardLease(Base):
+    """
+    Lease of a chat shard by a worker instance.
+    """
+
+    __tablename__ = "shard_leases"
+
+    shard = Column(Integer, primary_key=True)
+    worker_id = Column(String, nullable=True)
+    expires_at = Column(TIMESTAMP, nullable=True)
@@ -0,0 +1,52 @@
+"""
+Change-notification channel between writers (bot, tools) and the worker.
+"""
+
+from functools import cache
+
+from app.config import settings
+
+from .base import (
+    MESSAGE,
+    SCHEDULED,
+    SETTINGS,
+    BaseChangeNotifier,
+    ChangeEvent,
+    ChangeSubscription,
+    NullChangeNotifier,
+)
+from .memory import MemoryChangeNotifier
+from .postgres import PostgresChangeNotifier
+from .amqp import AmqpChangeNotifier
+
+
+@cache
+def get_change_notifier() -> BaseChangeNotifier:
+    """
+    Get the process-wide notifier of the configured backend.
+    """
+    backend = settings.notify.backend
+    if backend == "postgres":
+        return PostgresChangeNotifier(settings.database.url, settings.notify.channel)
+    if backend == "amqp":
+        if settings.notify.amqp is None:
+            raise ValueError("NOTIFY_AMQP must be set for the amqp notify backend")
+        return AmqpChangeNotifier(str(settings.notify.amqp), settings.notify.channel)
+    if backend == "memory":
+        return MemoryChangeNotifier()
+    return NullChangeNotifier()
+
+
+__all__ = [
+    "MESSAGE",
+    "SCHEDULED",
+    "SETTINGS",
+    "BaseChangeNotifier",
+    "ChangeEvent",
+    "ChangeSubscription",
+    "MemoryChangeNotifier",
+    "PostgresChangeNotifier",
+    "AmqpChangeNotifier",
+    "NullChangeNotifier",
+    "get_change_notifier",
+]
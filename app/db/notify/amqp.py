@@ -0,0 +1,69 @@
+import logging
+
+import aio_pika
+from aio_pika.abc import (
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractRobustConnection,
+)
+
+from .base import BaseChangeNotifier, ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+
+class AmqpChangeNotifier(BaseChangeNotifier):
+    """
+    Notifier backed by a RabbitMQ fanout exchange (aio-pika).
+    """
+
+    def __init__(self, url: str, exchange: str):
+        super().__init__()
+        self.url = url
+        self.exchange_name = exchange
+        self._connection: AbstractRobustConnection | None = None
+        self._exchange: AbstractExchange | None = None
+        self._consuming = False
+
+    async def _get_exchange(self) -> AbstractExchange:
+        if self._exchange is None:
+            self._connection = await aio_pika.connect_robust(self.url)
+            channel = await self._connection.channel()
+            self._exchange = await channel.declare_exchange(
+                self.exchange_name, aio_pika.ExchangeType.FANOUT
+            )
+        return self._exchange
+
+    async def start(self) -> None:
+        if self._consuming:
+            return
+        exchange = await self._get_exchange()
+        queue = await exchange.channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+        await queue.consume(self._on_message, no_ack=True)
+        self._consuming = True
+        logger.info(f"Listening for changes on exchange {self.exchange_name}")
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = None
+        self._exchange = None
+        self._consuming = False
+
+    async def publish(self, *events: ChangeEvent) -> None:
+        exchange = await self._get_exchange()
+        for event in events:
+            await exchange.publish(
+                aio_pika.Message(
+                    body=event.to_json().encode(),
+                    content_type="application/json",
+                ),
+                routing_key="",
+            )
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            self._dispatch(ChangeEvent.from_json(message.body))
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid change notification {message.body!r}: {e}")
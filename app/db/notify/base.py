@@ -0,0 +1,117 @@
+"""
+Base classes of the change-notification channel.
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Collection
+
+logger = logging.getLogger(__name__)
+
+MESSAGE = "message"
+SETTINGS = "settings"
+SCHEDULED = "scheduled"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """
+    A row relevant to the worker was written.
+
+    ``kind`` is the kind of row (message, settings, scheduled), ``type`` is the message
+    type name for messages.
+    """
+
+    kind: str
+    chat_id: int
+    type: str | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str | bytes) -> "ChangeEvent":
+        return cls(**json.loads(data))
+
+
+class ChangeSubscription:
+    """
+    Queue of change events delivered to one consumer.
+
+    Only events of ``kinds`` are queued, all of them when it is None.
+    """
+
+    def __init__(
+        self, notifier: "BaseChangeNotifier", kinds: Collection[str] | None = None
+    ):
+        self._notifier = notifier
+        self.kinds = kinds
+        self._queue: asyncio.Queue[ChangeEvent] = asyncio.Queue()
+
+    def put(self, event: ChangeEvent) -> None:
+        if self.kinds is None or event.kind in self.kinds:
+            self._queue.put_nowait(event)
+
+    async def wait(self, timeout: float | None = None) -> list[ChangeEvent]:
+        """
+        Wait for at least one event (or the timeout) and return all queued events.
+        """
+        try:
+            events = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+    def close(self) -> None:
+        self._notifier.unsubscribe(self)
+
+
+class BaseChangeNotifier(ABC):
+    """
+    Channel that tells workers about new messages and settings changes.
+
+    Writers call ``publish`` after committing, consumers ``subscribe`` and wait
+    on their subscription. Events are fanned out to every local subscription.
+    """
+
+    def __init__(self):
+        self._subscriptions: list[ChangeSubscription] = []
+
+    def subscribe(self, kinds: Collection[str] | None = None) -> ChangeSubscription:
+        subscription = ChangeSubscription(self, kinds)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def _dispatch(self, event: ChangeEvent) -> None:
+        for subscription in self._subscriptions:
+            subscription.put(event)
+
+    async def start(self) -> None:
+        """
+        Start receiving events published by other processes.
+        """
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, *events: ChangeEvent) -> None:
+        pass
+
+
+class NullChangeNotifier(BaseChangeNotifier):
+    """
+    Notifier that never delivers anything, consumers rely on polling.
+    """
+
+    async def publish(self, *events: ChangeEvent) -> None:
+        pass
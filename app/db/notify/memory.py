@@ -0,0 +1,11 @@
+from .base import BaseChangeNotifier, ChangeEvent
+
+
+class MemoryChangeNotifier(BaseChangeNotifier):
+    """
+    In-process notifier, events are only visible inside the current process.
+    """
+
+    async def publish(self, *events: ChangeEvent) -> None:
+        for event in events:
+            self._dispatch(event)
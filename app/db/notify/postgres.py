@@ -0,0 +1,64 @@
+import logging
+
+import asyncpg
+from sqlalchemy import make_url
+
+from .base import BaseChangeNotifier, ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresChangeNotifier(BaseChangeNotifier):
+    """
+    Notifier backed by Postgres LISTEN/NOTIFY.
+
+    Database triggers on ``messages``, ``chat_ai_settings`` and ``scheduled``
+    emit the notifications in the writing transaction, so ``publish`` has
+    nothing to do.
+    """
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(False)
+        self.channel = channel
+        self._connection: asyncpg.Connection | None = None
+
+    async def start(self) -> None:
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(self.channel, self._on_notification)
+        logger.info(f"Listening for changes on channel {self.channel}")
+        await self._check_triggers()
+
+    async def _check_triggers(self) -> None:
+        """
+        Log an error when the triggers notify another channel than ours.
+        """
+        source = await self._connection.fetchval(
+            "SELECT prosrc FROM pg_proc WHERE proname = 'notify_message_change'"
+        )
+        if source is not None and f"'{self.channel}'" not in source:
+            logger.error(
+                f"Change triggers do not notify channel {self.channel}, "
+                "it changed after the migrations ran; only polling will work"
+            )
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, *events: ChangeEvent) -> None:
+        pass
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            self._dispatch(ChangeEvent.from_json(payload))
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid change notification {payload}: {e}")
+
+    def _on_termination(self, connection) -> None:
+        logger.warning("Change notification connection closed")
+        self._connection = None
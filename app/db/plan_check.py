@@ -0,0 +1,96 @@
+"""
+Query plan regression check of the worker's hot queries.
+
+Run ``python -m app.db.plan_check`` against a migrated database: every hot
+query is explained and the check fails when its plan can not use the index
+it relies on. Sequential scans are disabled for the check so the result does
+not depend on how much data the database holds.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .conn import get_async_engine
+from .models import MessageType
+from .repos.chat import new_messages_chats_query
+from .repos.message import last_messages_query
+from .repos.scheduled import pending_query
+
+logger = logging.getLogger(__name__)
+
+# Query name -> (query builder, index the query must use)
+HOT_QUERIES: dict[str, tuple[Callable[[], Select], str]] = {
+    "MessageRepository.get_last_messages": (
+        lambda: last_messages_query(chat_id=0, limit=10),
+        "ix_messages_chat_id_id",
+    ),
+    "ChatRepository.get_awaible_new_messages_in_chats": (
+        lambda: new_messages_chats_query(
+            datetime.now(), except_types=[MessageType.TOOL_CALLS]
+        ),
+        "ix_messages_created_at",
+    ),
+    "ScheduledRepo.get_pending": (
+        lambda: pending_query(datetime.now(), limit=100),
+        "ix_scheduled_date_not_done",
+    ),
+}
+
+
+def _plan_indexes(plan: dict) -> set[str]:
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+    for subplan in plan.get("Plans", []):
+        indexes |= _plan_indexes(subplan)
+    return indexes
+
+
+async def check_query_plans(engine: AsyncEngine) -> dict[str, str]:
+    """
+    Explain every hot query.
+
+    Returns:
+        dict[str, str]: Failed query names mapped to the reason.
+    """
+    failures = {}
+    async with engine.connect() as connection:
+        async with connection.begin():
+            await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for name, (build_query, index) in HOT_QUERIES.items():
+                sql = build_query().compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {sql}"
+                )
+                plan = result.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used_indexes = _plan_indexes(plan[0]["Plan"])
+                if index not in used_indexes:
+                    failures[name] = (
+                        f"expected {index}, plan uses {sorted(used_indexes) or 'no index'}"
+                    )
+                    logger.error(f"{name}: {failures[name]}")
+                else:
+                    logger.info(f"{name}: uses {index}")
+    return failures
+
+
+async def main() -> int:
+    engine = get_async_engine()
+    try:
+        failures = await check_query_plans(engine)
+    finally:
+        await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
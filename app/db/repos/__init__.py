@@ -7,5 +7,18 @@ from .chat import ChatRepository
 from .message import MessageRepository
 from .user import UserRepository
 from .scheduled import ScheduledRepo
+from .ingest import IngestRepository, IngestedUpdate
+from .lease import LeaseRepository
+from .summary import SummaryRepository
 
-__all__ = ["BaseRepository", "UserRepository", "ChatRepository", "MessageRepository", "ScheduledRepo"]
+__all__ = [
+    "BaseRepository",
+    "UserRepository",
+    "ChatRepository",
+    "MessageRepository",
+    "ScheduledRepo",
+    "IngestRepository",
+    "IngestedUpdate",
+    "LeaseRepository",
+    "SummaryRepository",
+]
@@ -4,11 +4,18 @@ Base repository module.
 
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from ..notify import BaseChangeNotifier, NullChangeNotifier
+
 
 class BaseRepository:
     """
     Base repository for all database repositories.
     """
 
-    def __init__(self, async_session: async_sessionmaker):
+    def __init__(
+        self,
+        async_session: async_sessionmaker,
+        notifier: BaseChangeNotifier | None = None,
+    ):
         self.async_session = async_session
+        self.notifier = notifier or NullChangeNotifier()
@@ -1,15 +1,51 @@
-from sqlalchemy import insert, update, or_, not_
+from sqlalchemy import exists, insert, update, or_, not_
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, selectinload
 from datetime import datetime
 
 from app.db import Chat, ChatAISettings, Message, MessageType, ChatType
+from ..notify import SETTINGS, ChangeEvent
 from .base import BaseRepository
 
 UNSET = object()
 
 
+def upsert_chat_query(
+    chat_id: int,
+    title: str = None,
+    username: str = None,
+    type: ChatType = None,
+):
+    """
+    Build an insert statement that creates a chat or updates its information.
+    """
+    return (
+        pg_insert(Chat)
+        .values(id=chat_id, title=title, username=username, type=type)
+        .on_conflict_do_update(
+            index_elements=["id"],
+            set_={"title": title, "username": username, "type": type},
+        )
+    )
+
+
+def new_messages_chats_query(
+    last_processed: datetime, except_types: list[MessageType] | None = None
+):
+    """
+    Build a query of the chats that have new messages after the given timestamp.
+    """
+    return (
+        select(Message.chat_id)
+        .where(
+            Message.created_at > last_processed,
+            not_(Message.type.in_(except_types)) if except_types else True,
+        )
+        .group_by(Message.chat_id)
+    )
+
+
 class ChatRepository(BaseRepository):
     """
     Repository for handling chat-related database operations.
@@ -33,12 +69,7 @@ class ChatRepository(BaseRepository):
         """
         async with self.async_session() as session:
             await session.execute(
-                pg_insert(Chat)
-                .values(id=chat_id, title=title, username=username, type=type)
-                .on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={"title": title, "username": username, "type": type},
-                )
+                upsert_chat_query(chat_id, title=title, username=username, type=type)
             )
             await session.commit()
             return await self.get_chat_by_id(chat_id)
@@ -102,29 +133,69 @@ class ChatRepository(BaseRepository):
                     .returning(ChatAISettings)
                 )
                 await session.commit()
-                return result.scalar_one()
-            result = await session.execute(
-                select(ChatAISettings).filter(ChatAISettings.chat_id == chat_id)
-            )
-            return result.scalar_one()
+            else:
+                result = await session.execute(
+                    select(ChatAISettings).filter(ChatAISettings.chat_id == chat_id)
+                )
+            settings = result.scalar_one()
+        await self.notifier.publish(ChangeEvent(SETTINGS, chat_id))
+        return settings
 
-    async def get_updated_chats_settings(
-        self, last_processed: datetime
-    ) -> list[ChatAISettings]:
+    async def get_updated_chats(self, last_processed: datetime) -> list[Chat]:
         """
-        Get chats that have been updated after the given timestamp.
+        Get chats whose AI settings have been updated after the given timestamp.
+
+        The chats are returned with their ``ai_settings`` loaded.
         """
         async with self.async_session() as session:
             chats_updated = await session.execute(
-                select(ChatAISettings).where(
+                select(Chat)
+                .join(Chat.ai_settings)
+                .where(
                     or_(
                         ChatAISettings.updated_at > last_processed,
                         ChatAISettings.created_at > last_processed,
                     )
                 )
+                .options(contains_eager(Chat.ai_settings))
             )
             return chats_updated.scalars().all()
 
+    async def get_chats_by_ids(self, chat_ids: list[int]) -> list[Chat]:
+        """
+        Get chats with their ``ai_settings`` loaded, chats without settings are skipped.
+        """
+        async with self.async_session() as session:
+            chats = await session.execute(
+                select(Chat)
+                .join(Chat.ai_settings)
+                .where(Chat.id.in_(chat_ids))
+                .options(contains_eager(Chat.ai_settings))
+            )
+            return chats.scalars().all()
+
+    async def get_active_chats(self, since: datetime) -> list[Chat]:
+        """
+        Get chats that have a max not response timer, or settings or messages
+        written after the given timestamp, with their ``ai_settings`` loaded.
+        """
+        async with self.async_session() as session:
+            chats = await session.execute(
+                select(Chat)
+                .join(Chat.ai_settings)
+                .where(
+                    or_(
+                        ChatAISettings.max_not_response_time.is_not(None),
+                        ChatAISettings.updated_at > since,
+                        exists().where(
+                            Message.chat_id == Chat.id, Message.created_at > since
+                        ),
+                    )
+                )
+                .options(contains_eager(Chat.ai_settings))
+            )
+            return chats.scalars().all()
+
     async def get_awaible_new_messages_in_chats(
         self, last_processed: datetime, except_types: list[MessageType] | None = None
     ) -> list[int]:
@@ -133,11 +204,6 @@ class ChatRepository(BaseRepository):
         """
         async with self.async_session() as session:
             chats_updated = await session.execute(
-                select(Message.chat_id)
-                .where(
-                    Message.created_at > last_processed,
-                    not_(Message.type.in_(except_types)) if except_types else True,
-                )
-                .group_by(Message.chat_id)
+                new_messages_chats_query(last_processed, except_types)
             )
             return chats_updated.scalars().all()
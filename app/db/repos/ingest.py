@@ -0,0 +1,126 @@
+from typing import NamedTuple
+
+from sqlalchemy import exists, select, true, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.db import Chat, ChatAISettings, Message, User
+
+from ..notify import MESSAGE, ChangeEvent
+from .base import BaseRepository
+from .chat import upsert_chat_query
+from .message import insert_message_query
+from .user import upsert_user_query
+
+
+class IngestedUpdate(NamedTuple):
+    chat: Chat | None
+    user: User | None
+    message: Message | None
+    settings: ChatAISettings | None = None
+
+
+class IngestRepository(BaseRepository):
+    """
+    Repository for persisting an incoming Telegram update in one round trip.
+    """
+
+    async def ingest_update(
+        self,
+        chat: dict | None = None,
+        user: dict | None = None,
+        message: dict | None = None,
+        settings_chat_id: int | None = None,
+    ) -> IngestedUpdate:
+        """
+        Upsert the chat and the user and insert the message of an update.
+
+        Everything is written by a single statement built from data-modifying
+        CTEs (upsert ... RETURNING), so the update costs one round trip and one
+        transaction. The chat is returned with its ``ai_settings`` loaded
+        (default settings are created for new chats). When the chat itself does
+        not need to be written, ``settings_chat_id`` still loads its settings in
+        the same round trip.
+
+        Args:
+            chat (dict): Keyword arguments of ``ChatRepository.create_or_update_chat``.
+            user (dict): Keyword arguments of ``UserRepository.create_or_update_user``.
+            message (dict): Keyword arguments of ``MessageRepository.create_message``.
+            settings_chat_id (int): Chat to load AI settings for when ``chat`` is not given.
+
+        Returns:
+            IngestedUpdate: The persisted chat, user and message (None when not given).
+        """
+        entities = {}
+        if chat is not None:
+            chat_cte = (
+                upsert_chat_query(**chat)
+                .returning(*Chat.__table__.c)
+                .cte("ingest_chat")
+            )
+            entities["chat"] = (aliased(Chat, chat_cte), chat_cte)
+            settings_chat_id = chat["chat_id"]
+        if settings_chat_id is not None:
+            settings_cte = (
+                insert(ChatAISettings)
+                .values(chat_id=settings_chat_id)
+                .on_conflict_do_nothing(index_elements=["chat_id"])
+                .returning(*ChatAISettings.__table__.c)
+                .cte("ingest_settings")
+            )
+            settings_subquery = union_all(
+                select(settings_cte),
+                select(ChatAISettings.__table__).where(
+                    ChatAISettings.chat_id == settings_chat_id,
+                    ~exists(select(settings_cte.c.chat_id)),
+                ),
+            ).subquery("ingest_chat_settings")
+            entities["settings"] = (
+                aliased(ChatAISettings, settings_subquery),
+                settings_subquery,
+            )
+        if user is not None:
+            user_cte = (
+                upsert_user_query(**user)
+                .returning(*User.__table__.c)
+                .cte("ingest_user")
+            )
+            entities["user"] = (aliased(User, user_cte), user_cte)
+        if message is not None:
+            message_cte = (
+                insert_message_query(**message)
+                .returning(*Message.__table__.c)
+                .cte("ingest_message")
+            )
+            entities["message"] = (aliased(Message, message_cte), message_cte)
+
+        if not entities:
+            return IngestedUpdate(None, None, None, None)
+
+        (_, first_from), *others = entities.values()
+        statement = select(*(entity for entity, _ in entities.values())).select_from(
+            first_from
+        )
+        for _, from_clause in others:
+            statement = statement.join(from_clause, true(), isouter=True)
+
+        async with self.async_session() as session:
+            result = await session.execute(statement)
+            row = dict(zip(entities.keys(), result.one()))
+            await session.commit()
+
+        if message is not None:
+            await self.notifier.publish(
+                ChangeEvent(MESSAGE, message["chat_id"], message["type"].name)
+            )
+
+        db_chat = row.get("chat")
+        if db_chat is not None:
+            set_committed_value(db_chat, "ai_settings", row["settings"])
+        return IngestedUpdate(
+            chat=db_chat,
+            user=row.get("user"),
+            message=row.get("message"),
+            settings=row.get("settings"),
+        )
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from typing import Collection
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import ShardLease, WorkerHeartbeat
+from .base import BaseRepository
+
+
+class LeaseRepository(BaseRepository):
+    """
+    Repository for worker heartbeats and chat shard leases.
+
+    All times are taken from the database clock.
+    """
+
+    async def heartbeat(self, worker_id: str, ttl: float) -> int:
+        """
+        Record a heartbeat of the worker and forget workers that stopped beating.
+
+        Args:
+            worker_id (str): The ID of the worker instance.
+            ttl (float): Seconds after which a worker without heartbeat is dead.
+
+        Returns:
+            int: The number of live workers (including this one).
+        """
+        async with self.async_session() as session:
+            await session.execute(
+                insert(WorkerHeartbeat)
+                .values(worker_id=worker_id, heartbeat_at=func.now())
+                .on_conflict_do_update(
+                    index_elements=["worker_id"],
+                    set_={"heartbeat_at": func.now()},
+                )
+            )
+            await session.execute(
+                delete(WorkerHeartbeat).where(
+                    WorkerHeartbeat.heartbeat_at < func.now() - timedelta(seconds=ttl)
+                )
+            )
+            result = await session.execute(
+                select(func.count()).select_from(WorkerHeartbeat)
+            )
+            await session.commit()
+            return result.scalar_one()
+
+    async def create_shards(self, shards: int) -> None:
+        """
+        Create the (unleased) rows of shards that do not exist yet.
+        """
+        async with self.async_session() as session:
+            await session.execute(
+                insert(ShardLease)
+                .values([{"shard": shard} for shard in range(shards)])
+                .on_conflict_do_nothing(index_elements=["shard"])
+            )
+            await session.commit()
+
+    async def sync_leases(
+        self,
+        worker_id: str,
+        shards: int,
+        ttl: float,
+        target: int,
+        busy: Collection[int] = (),
+    ) -> tuple[list[int], list[int]]:
+        """
+        Renew the worker's leases and move towards ``target`` owned shards.
+
+        Extra shards are released unless they are ``busy``, missing ones are
+        claimed from free or expired leases with ``FOR UPDATE SKIP LOCKED`` so
+        concurrent workers never claim the same shard.
+
+        Returns:
+            tuple[list[int], list[int]]: The shards leased by the worker and the
+                extra busy shards it keeps until they are idle.
+        """
+        expires_at = func.now() + timedelta(seconds=ttl)
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(ShardLease)
+                .where(ShardLease.worker_id == worker_id, ShardLease.shard < shards)
+                .values(expires_at=expires_at)
+                .returning(ShardLease.shard)
+            )
+            owned = sorted(result.scalars().all())
+
+            draining = []
+            if len(owned) > target:
+                surplus = owned[target:]
+                draining = [shard for shard in surplus if shard in busy]
+                released = [shard for shard in surplus if shard not in busy]
+                if released:
+                    await session.execute(
+                        update(ShardLease)
+                        .where(ShardLease.shard.in_(released))
+                        .values(worker_id=None, expires_at=None)
+                    )
+                owned = owned[:target]
+            elif len(owned) < target:
+                result = await session.execute(
+                    select(ShardLease.shard)
+                    .where(
+                        ShardLease.shard < shards,
+                        or_(
+                            ShardLease.worker_id.is_(None),
+                            ShardLease.expires_at < func.now(),
+                        ),
+                    )
+                    .order_by(ShardLease.shard)
+                    .limit(target - len(owned))
+                    .with_for_update(skip_locked=True)
+                )
+                claimed = result.scalars().all()
+                if claimed:
+                    await session.execute(
+                        update(ShardLease)
+                        .where(ShardLease.shard.in_(claimed))
+                        .values(worker_id=worker_id, expires_at=expires_at)
+                    )
+                owned = sorted([*owned, *claimed])
+            await session.commit()
+            return owned, draining
+
+    async def release(self, worker_id: str) -> None:
+        """
+        Release every lease and the heartbeat of a stopping worker.
+        """
+        async with self.async_session() as session:
+            await session.execute(
+                update(ShardLease)
+                .where(ShardLease.worker_id == worker_id)
+                .values(worker_id=None, expires_at=None)
+            )
+            await session.execute(
+                delete(WorkerHeartbeat).where(WorkerHeartbeat.worker_id == worker_id)
+            )
+            await session.commit()
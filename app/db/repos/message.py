@@ -1,13 +1,90 @@
-from sqlalchemy import select
+from typing import TYPE_CHECKING, AsyncIterator
+from uuid import UUID
+
+from sqlalchemy import func, select
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import selectinload
 
 from app.db import Message, MessageType
 
+from ..models import uuid7
+from ..notify import MESSAGE, BaseChangeNotifier, ChangeEvent
 from .base import BaseRepository
 
+if TYPE_CHECKING:
+    from ..buffer import MessageWriteBuffer
+
+
+def message_row(
+    chat_id: int,
+    type: MessageType,
+    from_user_id: int | None = None,
+    content: str = None,
+    telegram_id: int | None = None,
+    payload: dict | None = None,
+) -> dict:
+    """
+    Build the column values of a new message.
+    """
+    return dict(
+        chat_id=chat_id,
+        from_user_id=from_user_id,
+        type=type,
+        content=content or "",
+        telegram_id=telegram_id,
+        payload=payload,
+    )
+
+
+def insert_message_query(**kwargs):
+    """
+    Build an insert statement for a new message (``message_row`` arguments).
+    """
+    return insert(Message).values(**message_row(**kwargs))
+
+
+def last_messages_query(chat_id: int, limit: int = 10, before_id: UUID | None = None):
+    """
+    Build a query of the last messages of a chat, newest first.
+
+    Message ids are time-ordered (UUIDv7), so they alone give the order and
+    ``before_id`` continues a previous page (keyset pagination).
+    """
+    query = select(Message).where(Message.chat_id == chat_id)
+    if before_id is not None:
+        query = query.where(Message.id < before_id)
+    return (
+        query.order_by(Message.id.desc())
+        .options(selectinload(Message.from_user))
+        .limit(limit)
+    )
+
+
+def messages_between_query(
+    chat_id: int, after_id: UUID | None = None, before_id: UUID | None = None
+):
+    """
+    Build a query of the messages of a chat between two messages, oldest first.
+    """
+    query = select(Message).where(Message.chat_id == chat_id)
+    if after_id is not None:
+        query = query.where(Message.id > after_id)
+    if before_id is not None:
+        query = query.where(Message.id < before_id)
+    return query.order_by(Message.id)
+
 
 class MessageRepository(BaseRepository):
+    def __init__(
+        self,
+        async_session: async_sessionmaker,
+        notifier: BaseChangeNotifier | None = None,
+        buffer: "MessageWriteBuffer | None" = None,
+    ):
+        super().__init__(async_session, notifier)
+        self.buffer = buffer
+
     async def create_message(
         self,
         chat_id: int,
@@ -16,10 +93,14 @@ class MessageRepository(BaseRepository):
         content: str = None,
         telegram_id: int | None = None,
         payload: dict | None = None,
+        wait: bool = True,
     ) -> Message:
         """
         Create a new message.
 
+        With the write buffer enabled the row is inserted with a batch of
+        others; ``wait=False`` returns a not yet persisted message right away.
+
         Args:
             chat_id (int): The ID of the chat.
             type (MessageType): The type of the message.
@@ -27,43 +108,182 @@ class MessageRepository(BaseRepository):
             content (str): The content of the message.
             telegram_id (int): The ID of the message in Telegram.
             payload (dict): Additional data associated with the message.
+            wait (bool): Wait until the message is persisted.
 
         Returns:
             Message: The newly created message.
         """
+        row = message_row(
+            chat_id=chat_id,
+            type=type,
+            from_user_id=from_user_id,
+            content=content,
+            telegram_id=telegram_id,
+            payload=payload,
+        )
+        if self.buffer is not None:
+            row["id"] = uuid7()
+            future = self.buffer.add(row)
+            if wait:
+                return await future
+            return Message(**row)
+
         async with self.async_session() as session:
             result = await session.execute(
-                insert(Message).values(
-                    chat_id=chat_id,
-                    from_user_id=from_user_id,
-                    type=type,
-                    content=content or "",
-                    telegram_id=telegram_id,
-                    payload=payload,
-                ).returning(Message)
+                insert(Message).values(**row).returning(Message)
             )
 
             await session.commit()
-            return result.scalar_one()
+            message = result.scalar_one()
+        await self.notifier.publish(ChangeEvent(MESSAGE, chat_id, type.name))
+        return message
 
-    async def get_last_messages(self, chat_id: int, limit: int = 10) -> list[Message]:
+    async def get_last_messages(
+        self, chat_id: int, limit: int = 10, before_id: UUID | None = None
+    ) -> list[Message]:
         """
         Get the last messages from a chat.
 
         Args:
             chat_id (int): The ID of the chat.
             limit (int): The maximum number of messages to retrieve.
+            before_id (UUID): Only retrieve messages older than this one.
 
         Returns:
             list[Message]: A list of the last messages from the chat.
         """
         async with self.async_session() as session:
             result = await session.execute(
-                select(Message)
-                .where(Message.chat_id == chat_id)
-                .order_by(Message.created_at.desc(), Message.id.desc())
+                last_messages_query(chat_id, limit, before_id)
+            )
+
+            return result.scalars().all()
+
+    async def iter_last_messages(
+        self, chat_id: int, page: int = 50, limit: int | None = None
+    ) -> AsyncIterator[list[Message]]:
+        """
+        Iterate over the messages of a chat in pages, newest first.
+
+        Args:
+            chat_id (int): The ID of the chat.
+            page (int): The number of messages per page.
+            limit (int): The maximum number of messages to retrieve in total.
+
+        Yields:
+            list[Message]: The next page of older messages.
+        """
+        before_id = None
+        while limit is None or limit > 0:
+            size = page if limit is None else min(page, limit)
+            messages = await self.get_last_messages(chat_id, size, before_id)
+            if messages:
+                yield messages
+            if len(messages) < size:
+                return
+            before_id = messages[-1].id
+            if limit is not None:
+                limit -= len(messages)
+
+    async def get_messages_between(
+        self,
+        chat_id: int,
+        after_id: UUID | None = None,
+        before_id: UUID | None = None,
+        limit: int = 100,
+    ) -> list[Message]:
+        """
+        Get the messages of a chat between two messages (both excluded).
+
+        Args:
+            chat_id (int): The ID of the chat.
+            after_id (UUID): Only retrieve messages newer than this one.
+            before_id (UUID): Only retrieve messages older than this one.
+            limit (int): The maximum number of messages to retrieve.
+
+        Returns:
+            list[Message]: The messages, oldest first.
+        """
+        async with self.async_session() as session:
+            result = await session.execute(
+                messages_between_query(chat_id, after_id, before_id)
                 .options(selectinload(Message.from_user))
                 .limit(limit)
             )
+            return result.scalars().all()
+
+    async def count_messages_between(
+        self,
+        chat_id: int,
+        after_id: UUID | None = None,
+        before_id: UUID | None = None,
+    ) -> int:
+        """
+        Count the messages of a chat between two messages (both excluded).
+
+        Args:
+            chat_id (int): The ID of the chat.
+            after_id (UUID): Only count messages newer than this one.
+            before_id (UUID): Only count messages older than this one.
+
+        Returns:
+            int: The number of messages.
+        """
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(func.count()).select_from(
+                    messages_between_query(chat_id, after_id, before_id)
+                    .order_by(None)
+                    .subquery()
+                )
+            )
+            return result.scalar_one()
+
+    async def get_messages_by_ids(self, chat_id: int, ids: list[UUID]) -> list[Message]:
+        """
+        Get messages of a chat by their IDs.
+
+        Args:
+            chat_id (int): The ID of the chat.
+            ids (list[UUID]): The IDs of the messages.
 
+        Returns:
+            list[Message]: The found messages, oldest first.
+        """
+        if not ids:
+            return []
+        async with self.async_session() as session:
+            result = await session.execute(
+                messages_between_query(chat_id)
+                .where(Message.id.in_(ids))
+                .options(selectinload(Message.from_user))
+            )
             return result.scalars().all()
+
+    async def has_new_messages(
+        self,
+        chat_id: int,
+        after_id: UUID | None = None,
+        except_user_id: int | None = None,
+        except_types: list[MessageType] | None = None,
+    ) -> bool:
+        """
+        Check whether a chat has messages newer than the given one.
+
+        Args:
+            chat_id (int): The ID of the chat.
+            after_id (UUID): Only check messages newer than this one.
+            except_user_id (int): Ignore messages of this user.
+            except_types (list[MessageType]): Ignore messages of these types.
+
+        Returns:
+            bool: True if there is at least one such message.
+        """
+        query = messages_between_query(chat_id, after_id).order_by(None)
+        if except_user_id is not None:
+            query = query.where(Message.from_user_id.is_distinct_from(except_user_id))
+        if except_types:
+            query = query.where(Message.type.not_in(except_types))
+        async with self.async_session() as session:
+            result = await session.execute(select(query.exists()))
+            return result.scalar_one()
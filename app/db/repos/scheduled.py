@@ -1,11 +1,28 @@
 from datetime import datetime
-from uuid import UUID
 
 from sqlalchemy import insert, select, update
 
 from .base import BaseRepository
+from .message import message_row
 
-from ..models import Scheduled
+from ..models import Message, MessageType, Scheduled
+from ..notify import MESSAGE, SCHEDULED, ChangeEvent
+
+
+def pending_query(until: datetime, limit: int = 100):
+    """
+    Build a query of the not done scheduled notifications due by ``until``,
+    earliest first.
+    """
+    return (
+        select(Scheduled)
+        .where(
+            Scheduled.is_done == False, # noqa: E712
+            Scheduled.date <= until,
+        )
+        .order_by(Scheduled.date)
+        .limit(limit)
+    )
 
 
 class ScheduledRepo(BaseRepository):
@@ -17,21 +34,57 @@ class ScheduledRepo(BaseRepository):
                 .returning(Scheduled)
             )
             await session.commit()
-            return result.scalar_one()
+            scheduled = result.scalar_one()
+        await self.notifier.publish(ChangeEvent(SCHEDULED, chat_id))
+        return scheduled
 
-    async def get_all_not_done(self, limit: int = 20) -> list[Scheduled]:
+    async def get_pending(self, until: datetime, limit: int = 100) -> list[Scheduled]:
         async with self.async_session() as session:
-            result = await session.execute(
-                select(Scheduled).where(
-                    Scheduled.is_done == False, # noqa: E712
-                    Scheduled.date < datetime.now(),
-                ).limit(limit)
-            )
+            result = await session.execute(pending_query(until, limit))
             return result.scalars().all()
 
-    async def marks_as_done(self, ids: list[UUID]):
+    async def deliver_due(self, from_user_id: int, limit: int = 100) -> list[Scheduled]:
+        """
+        Deliver the due notifications as messages and mark them done.
+
+        Everything happens in one transaction. Notifications claimed by a
+        concurrent transaction are skipped (``FOR UPDATE SKIP LOCKED``).
+
+        Args:
+            from_user_id (int): The ID of the user the messages are from.
+            limit (int): Maximum number of notifications to deliver.
+
+        Returns:
+            list[Scheduled]: The delivered notifications.
+        """
         async with self.async_session() as session:
-            await session.execute(
-                update(Scheduled).where(Scheduled.id.in_(ids)).values(is_done=True)
+            result = await session.execute(
+                pending_query(datetime.now(), limit).with_for_update(skip_locked=True)
             )
+            scheduled = result.scalars().all()
+            if scheduled:
+                await session.execute(
+                    insert(Message),
+                    [
+                        message_row(
+                            chat_id=s.chat_id,
+                            type=MessageType.NOTIFICATION,
+                            from_user_id=from_user_id,
+                            content=s.message,
+                        )
+                        for s in scheduled
+                    ],
+                )
+                await session.execute(
+                    update(Scheduled)
+                    .where(Scheduled.id.in_([s.id for s in scheduled]))
+                    .values(is_done=True)
+                )
             await session.commit()
+        await self.notifier.publish(
+            *(
+                ChangeEvent(MESSAGE, s.chat_id, MessageType.NOTIFICATION.name)
+                for s in scheduled
+            )
+        )
+        return scheduled
@@ -0,0 +1,60 @@
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db import ChatSummary
+
+from .base import BaseRepository
+
+
+class SummaryRepository(BaseRepository):
+    """
+    Repository for the rolling summaries of chats.
+    """
+
+    async def get_summary(self, chat_id: int) -> ChatSummary | None:
+        """
+        Get the summary of a chat.
+
+        Args:
+            chat_id (int): The ID of the chat.
+
+        Returns:
+            ChatSummary | None: The summary, None if the chat has not been summarized yet.
+        """
+        async with self.async_session() as session:
+            return await session.get(ChatSummary, chat_id)
+
+    async def save_summary(
+        self, chat_id: int, content: str, last_message_id: UUID
+    ) -> ChatSummary:
+        """
+        Create or replace the summary of a chat.
+
+        Args:
+            chat_id (int): The ID of the chat.
+            content (str): The summary text.
+            last_message_id (UUID): The newest message covered by the summary.
+
+        Returns:
+            ChatSummary: The saved summary.
+        """
+        async with self.async_session() as session:
+            result = await session.execute(
+                insert(ChatSummary)
+                .values(
+                    chat_id=chat_id, content=content, last_message_id=last_message_id
+                )
+                .on_conflict_do_update(
+                    index_elements=["chat_id"],
+                    set_={
+                        "content": content,
+                        "last_message_id": last_message_id,
+                        "updated_at": func.now(),
+                    },
+                )
+                .returning(ChatSummary)
+            )
+            await session.commit()
+            return result.scalar_one()
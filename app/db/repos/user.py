@@ -9,6 +9,37 @@ from app.db import User
 from .base import BaseRepository
 
 
+def upsert_user_query(
+    user_id: int,
+    first_name: str = None,
+    last_name: str = None,
+    username: str = None,
+):
+    """
+    Build an insert statement that creates a user or updates their information.
+    """
+    return (
+        insert(User)
+        .values(
+            id=user_id,
+            first_name=first_name,
+            last_name=last_name,
+            username=username,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+        .on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "first_name": first_name,
+                "last_name": last_name,
+                "username": username,
+                "updated_at": datetime.utcnow(),
+            },
+        )
+    )
+
+
 class UserRepository(BaseRepository):
     """
     Repository for handling user-related database operations.
@@ -32,25 +63,12 @@ class UserRepository(BaseRepository):
         """
         async with self.async_session() as session:
             result = await session.execute(
-                insert(User)
-                    .values(
-                    id=user_id,
+                upsert_user_query(
+                    user_id,
                     first_name=first_name,
                     last_name=last_name,
                     username=username,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow(),
-                )
-                .on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "username": username,
-                        "updated_at": datetime.utcnow(),
-                    },
-                )
-                .returning(User)
+                ).returning(User)
             )
 
             await session.commit()
@@ -4,19 +4,26 @@ import logging
 from .chat_processor import BackgroundChatsProcessor
 from .scheduled import ScheduledWorker
 from app.bot.core import bot
+from app.db.buffer import get_message_buffer
 
 async def main():
     logging.basicConfig(level=logging.DEBUG)
     logger = logging.getLogger(__name__)
     logger.info("Starting worker")
-    await asyncio.gather(
-        BackgroundChatsProcessor(
-            bot=bot,
-        ).run(),
-        ScheduledWorker(
-            assistant_id=bot.id,
-        ).run()
-    )
+    try:
+        await asyncio.gather(
+            BackgroundChatsProcessor(
+                bot=bot,
+            ).run(),
+            ScheduledWorker(
+                assistant_id=bot.id,
+            ).run()
+        )
+    finally:
+        # Write buffered messages before exiting
+        buffer = get_message_buffer()
+        if buffer is not None:
+            await buffer.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
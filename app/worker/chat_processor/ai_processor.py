@@ -1,80 +1,217 @@
+import asyncio
 import logging
+import time
 
 from aiogram import Bot
 
 from app.db import DBReposContext
 from app.db import MessageType
-from app.db import Chat
+from app.db import Chat, ChatSummary, Message
+from app.cache import LRUCache
+from app.config import settings
+from app.constants import TIMEOUT_TOOL_MESSAGE
 
 from app.ai_provider import AIProvider
 from app.ai_provider.tools import BaseTool, get_tools
-from app.ai_provider.services.base import AiResponse
+from app.ai_provider.services.base import AiResponse, AiUsage, BaseAIService
 from app.ai_provider.conversation import ConversationBuilder
+from app.ai_provider.streaming import StreamRecorder
+
+from .delivery import MessageStreamer
+from .recall import ChatRecall
+from .summarizer import ChatSummarizer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AIProcessor:
-    def __init__(self, bot: Bot, ai_provider: AIProvider, **workflow_data):
+    def __init__(
+        self,
+        bot: Bot,
+        ai_provider: AIProvider,
+        chat_cache: LRUCache[Chat] | None = None,
+        **workflow_data,
+    ):
         self.db = DBReposContext()
         self.bot = bot
         self.ai_provider = ai_provider
+        # An empty cache is falsy, the shared one must not be replaced
+        self.chat_cache = (
+            chat_cache
+            if chat_cache is not None
+            else LRUCache(settings.worker.chats, settings.worker.ttl)
+        )
         self.conversation_builder = ConversationBuilder(self.assistant_user_id)
+        self.summarizer = ChatSummarizer(
+            self.db, self.ai_provider, self.conversation_builder
+        )
+        self.recall = ChatRecall(self.db, self.ai_provider, self.conversation_builder)
+        # Estimated tokens of generations cancelled as stale
+        self.discarded_usage = AiUsage()
         self.workflow_data = workflow_data
     
     async def _get_chat(self, chat_id: int) -> Chat:
+        db_chat = self.chat_cache.get(chat_id)
+        if db_chat is not None:
+            return db_chat
         db_chat = await self.db.chat.get_chat_by_id(chat_id=chat_id)
         if db_chat is None:
             raise ValueError(f"Chat {chat_id} not found")
+        self.chat_cache.set(chat_id, db_chat)
         return db_chat
 
     @property
     def assistant_user_id(self) -> int:
         return self.bot.id
 
-    def _get_context(self, chat: Chat) -> dict:
+    def _get_context(self, chat: Chat, streamer: MessageStreamer | None = None) -> dict:
         return {
             "bot": self.bot,
             "chat": chat,
             "chat_id": chat.id,
             "db": self.db,
             "assistant_id": self.assistant_user_id,
+            "streamed_messages": streamer.messages if streamer is not None else None,
             **self.workflow_data,
         }
 
     async def process_chat(
         self,
         chat_id: int,
-    ):
+        stale: asyncio.Event | None = None,
+    ) -> float:
+        """
+        Answer the newest messages of a chat.
+
+        Returns:
+            float: When the answered messages were fetched, a restarted turn
+                also answered the messages that made it stale.
+        """
         chat = await self._get_chat(chat_id)
         await self.bot.send_chat_action(chat.id, action="typing")
-        response = await self._generate_response(chat=chat)
-        await self._process_ai_response(chat=chat, response=response)
+        summary = await self.db.summary.get_summary(chat.id)
+        for attempt in range(settings.worker.restarts + 1):
+            streamer = MessageStreamer(self.bot, chat.id) if settings.ai.stream else None
+            try:
+                fetched_at = time.time()
+                messages = await self._get_context_messages(chat=chat, summary=summary)
+                response = await self._generate_unless_stale(
+                    chat=chat,
+                    messages=messages,
+                    summary=summary,
+                    streamer=streamer,
+                    # The last attempt is not cancelled, so busy chats get an answer
+                    stale=stale if attempt < settings.worker.restarts else None,
+                )
+                if response is None:
+                    logger.info(f"Restarting stale generation for chat_id: {chat.id}")
+                    continue
+                if streamer is not None:
+                    # Previews must not be edited after SendMessage finalized them
+                    await streamer.close()
+                await self._process_ai_response(
+                    chat=chat, response=response, streamer=streamer
+                )
+            finally:
+                if streamer is not None:
+                    await streamer.discard()
+            break
+        # Messages that fell out of the window go to the summary after the reply,
+        # without holding up the next turn of the chat
+        if messages:
+            self.summarizer.schedule_update(
+                chat=chat, summary=summary, before_id=messages[-1].id
+            )
+        return fetched_at
 
+    async def _generate_unless_stale(
+        self,
+        chat: Chat,
+        messages: list[Message],
+        streamer: MessageStreamer | None = None,
+        stale: asyncio.Event | None = None,
+        **kwargs,
+    ) -> AiResponse | None:
+        """
+        Generate a response, cancelled when users write after the window.
+
+        Returns None when the generation was cancelled. Tools only run after the
+        generation and a turn with a visible preview is not cancelled, so a
+        cancelled turn has no side effects.
+        """
+        if stale is None:
+            return await self._generate_response(
+                chat=chat, messages=messages, streamer=streamer, **kwargs
+            )
+        stale.clear()
+        generation = asyncio.create_task(
+            self._generate_response(
+                chat=chat, messages=messages, streamer=streamer, **kwargs
+            )
+        )
+        try:
+            while True:
+                stale_wait = asyncio.create_task(stale.wait())
+                done, _ = await asyncio.wait(
+                    {generation, stale_wait}, return_when=asyncio.FIRST_COMPLETED
+                )
+                stale_wait.cancel()
+                if generation in done:
+                    return generation.result()
+                stale.clear()
+                # Messages of the assistant itself also wake the worker up
+                is_stale = await self.db.message.has_new_messages(
+                    chat_id=chat.id,
+                    after_id=messages[0].id if messages else None,
+                    except_user_id=self.assistant_user_id,
+                    except_types=[MessageType.TOOL_CALLS, MessageType.AI_REFLECTION],
+                )
+                if streamer is not None and streamer.visible:
+                    # Users already see the answer, it is finished instead
+                    logger.info(f"Not restarting a visible answer for chat_id: {chat.id}")
+                    return await generation
+                if is_stale:
+                    return None
+        finally:
+            if not generation.done():
+                generation.cancel()
+                await asyncio.gather(generation, return_exceptions=True)
 
     async def _process_tool_call(
         self,
         tools: list[BaseTool],
         chat: Chat,
+        streamer: MessageStreamer | None = None,
     ):
         logger.debug(f"Processing tool calls for chat_id: {chat.id}")
         if not tools:
             logger.debug(f"No tools provided for processing for chat_id: {chat.id}")
             return
 
+        # Order sensitive calls keep their order in one chain, others run alongside
+        results = {}
+        chain = [tool for tool in tools if tool.order_sensitive]
+        groups = [[tool] for tool in tools if not tool.order_sensitive]
+        if chain:
+            groups.insert(0, chain)
+        tasks = [
+            asyncio.create_task(self._run_tools(group, chat, results, streamer))
+            for group in groups
+        ]
+        _, pending = await asyncio.wait(tasks, timeout=settings.worker.tools)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Tool calls timed out for chat_id: {chat.id}")
+
+        # Results are persisted in the original call order
         tools_results = {}
         for tool in tools:
-            try:
-                logger.debug(f"Running tool: {tool.extra_payload}")
-                result_tool = await tool.run(
-                    context=self._get_context(chat)
-                )
-            except Exception as e:
-                logger.error(f"Error running tool {tool.extra_payload.get('id')}: {str(e)}")
-                result_tool = str(e)
-
-            tools_results[tool.extra_payload.get("id")] = result_tool
+            tool_id = tool.extra_payload.get("id")
+            tools_results[tool_id] = results.get(tool_id, TIMEOUT_TOOL_MESSAGE)
 
+        # Waited for: it marks the answered messages for the next turn's history
         await self.db.message.create_message(
             chat_id=chat.id,
             from_user_id=self.assistant_user_id,
@@ -86,38 +223,112 @@ class AIProcessor:
         )
         logger.info(f"Tool calls processed for chat_id: {chat.id}")
 
-    async def _generate_response(
+    async def _run_tools(
         self,
+        tools: list[BaseTool],
         chat: Chat,
+        results: dict,
+        streamer: MessageStreamer | None = None,
     ):
-        logger.debug(f"Generating response for chat_id: {chat.id}")
-        # Get ai service
+        for tool in tools:
+            try:
+                logger.debug(f"Running tool: {tool.extra_payload}")
+                result_tool = await tool.run(
+                    context=self._get_context(chat, streamer)
+                )
+            except Exception as e:
+                logger.error(f"Error running tool {tool.extra_payload.get('id')}: {str(e)}")
+                result_tool = str(e)
+
+            results[tool.extra_payload.get("id")] = result_tool
+
+    def _get_ai_service(self, chat: Chat) -> BaseAIService:
         ai_service = self.ai_provider.get_ai_service(chat.ai_settings.provider)
         if ai_service is None:
             logger.error(f"AI service {chat.ai_settings.provider} not found")
             raise ValueError(f"AI service {chat.ai_settings.provider} not found")
-        # Get last messages from db
-        messages = await self.db.message.get_last_messages(
-            chat_id=chat.id,
-            limit=chat.ai_settings.messages_context_limit,
-        )
+        return ai_service
+
+    async def _generate_response(
+        self,
+        chat: Chat,
+        messages: list[Message],
+        summary: ChatSummary | None = None,
+        streamer: MessageStreamer | None = None,
+    ) -> AiResponse:
+        logger.debug(f"Generating response for chat_id: {chat.id}")
+        # Get ai service
+        ai_service = self._get_ai_service(chat)
+        # Older messages relevant to the window
+        recalled = await self.recall.recall(chat=chat, window=messages)
         # Prepare messages for ai
         conversation = self.conversation_builder.build(
             chat=chat,
             messages=reversed(messages),
+            summary=summary.content if summary is not None else None,
+            recalled=recalled,
         )
         logger.debug(f"Conversation by {chat.id}: {conversation}")
         # Generate response from ai
-        response = await ai_service.generate_response(
-            messages=conversation, tools=get_tools(context=self._get_context(chat))
-        )
+        tools = get_tools(context=self._get_context(chat))
+        # Without previews the stream is only recorded, for the discarded usage
+        listener = streamer if streamer is not None else StreamRecorder()
+        try:
+            response = await ai_service.stream_response(
+                messages=conversation, tools=tools, listener=listener
+            )
+        except asyncio.CancelledError:
+            self._record_discarded(chat, conversation, listener)
+            raise
         logger.debug(f"Response generated for chat_id: {chat.id}")
         return response
 
+    def _record_discarded(
+        self, chat: Chat, conversation: list[dict], listener: StreamRecorder
+    ):
+        """
+        Account the (estimated) tokens of a cancelled generation.
+        """
+        estimator = self.conversation_builder.estimator
+        usage = AiUsage(
+            prompt_tokens=estimator.estimate_entries(conversation),
+            completion_tokens=estimator.estimate_text(listener.streamed),
+        )
+        self.discarded_usage.add(usage)
+        logger.info(
+            f"Discarded generation for chat_id {chat.id}: ~{usage.prompt_tokens} prompt, "
+            f"~{usage.completion_tokens} completion tokens; "
+            f"total discarded ~{self.discarded_usage.prompt_tokens + self.discarded_usage.completion_tokens}"
+        )
+
+    async def _get_context_messages(
+        self, chat: Chat, summary: ChatSummary | None = None
+    ) -> list[Message]:
+        """
+        Fetch the newest messages that fit the token budget, newest first.
+        """
+        ai_service = self._get_ai_service(chat)
+        tools = get_tools(context=self._get_context(chat))
+        window = self.conversation_builder.start_window(
+            chat,
+            budget=ai_service.context_budget - self.recall.budget,
+            summary=summary.content if summary is not None else None,
+            tool_schemas=ai_service.tool_schemas(tools),
+        )
+        async for page in self.db.message.iter_last_messages(
+            chat_id=chat.id,
+            page=settings.ai.page,
+            limit=chat.ai_settings.messages_context_limit,
+        ):
+            if window.extend(page):
+                break
+        return window.messages
+
     async def _process_ai_response(
         self,
         chat: Chat,
         response: AiResponse,
+        streamer: MessageStreamer | None = None,
     ):
         logger.debug(f"Processing AI response for chat_id: {chat.id}")
         # Save response to db
@@ -127,10 +338,12 @@ class AIProcessor:
                 from_user_id=self.assistant_user_id,
                 type=MessageType.AI_REFLECTION,
                 content=response.response,
+                wait=False,
             )
             logger.info(f"AI response saved for chat_id: {chat.id}")
         # Process tool call
         await self._process_tool_call(
             tools=response.tools,
             chat=chat,
+            streamer=streamer,
         )
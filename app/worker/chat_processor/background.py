@@ -1,14 +1,25 @@
 import logging
-import time
 import asyncio
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 from aiogram import Bot
 
 from app.ai_provider import AIProvider
-from app.db import DBReposContext, MessageType
+from app.cache import LRUCache
+from app.config import settings
+from app.db import Chat, DBReposContext, MessageType
+from app.db.notify import (
+    MESSAGE,
+    SETTINGS,
+    BaseChangeNotifier,
+    NullChangeNotifier,
+    get_change_notifier,
+)
 
 from .ai_processor import AIProcessor
+from .leasing import ShardLeaseManager, shard_of
+from .scheduler import ChatScheduler
 from .types import ChatProcessInfo
 
 
@@ -16,6 +27,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MINIMAL_SLEEP = 1  # 1 seconds
+EVICT_INTERVAL = 60  # seconds
 
 
 class BackgroundChatsProcessor:
@@ -23,79 +35,220 @@ class BackgroundChatsProcessor:
     Background task for processing chats.
     """
 
-    def __init__(self, bot: Bot, **workflow_data):
+    def __init__(
+        self,
+        bot: Bot,
+        notifier: BaseChangeNotifier | None = None,
+        **workflow_data,
+    ):
         self.bot = bot
         self.ai_provider = AIProvider()
+        self.notifier = notifier or get_change_notifier()
         self.workflow_data = workflow_data
 
         self.chats: dict[int, ChatProcessInfo] = {}
+        # Chats with AI settings for the AI processor, fed by _update_chats
+        self.chat_cache: LRUCache[Chat] = LRUCache(
+            settings.worker.chats, settings.worker.ttl
+        )
+        self.scheduler = ChatScheduler()
+        # Bound of concurrently processed chats and per-chat in-flight guard
+        self.semaphore = asyncio.Semaphore(settings.worker.concurrency)
+        self.in_flight: set[int] = set()
+        # Set when new messages arrive for a chat while it is processing
+        self.stale: dict[int, asyncio.Event] = {}
+        self.tasks: set[asyncio.Task] = set()
+        # Chat shards leased to this instance when running several replicas
+        self.leases: ShardLeaseManager | None = None
+        if settings.worker.sharding:
+            self.leases = ShardLeaseManager(
+                DBReposContext(notifier=self.notifier),
+                shards=settings.worker.shards,
+                ttl=settings.worker.lease,
+                interval=settings.worker.heartbeat,
+                in_flight=self.in_flight,
+            )
 
     async def _process_chats(self):
-        tasks = []
         ai_processor = AIProcessor(
             self.bot,
             self.ai_provider,
+            chat_cache=self.chat_cache,
             **self.workflow_data,
         )
         while True:
-            last_processed = time.time()
-            logger.debug(f"Start processing {len(self.chats)} chats")
-            for chat_id in list(self.chats.keys()):
-                chat_info = self.chats[chat_id]
+            # Sleep until the earliest chat deadline (or an earlier one is scheduled)
+            await self.scheduler.wait()
+            for chat_id in self.scheduler.pop_due():
+                chat_info = self.chats.get(chat_id)
+                if chat_info is None:
+                    continue
+                if not self._owns(chat_id):
+                    logger.debug(f"Chat {chat_id} is leased by another worker")
+                    continue
+                if chat_id in self.in_flight:
+                    # Rescheduled when the running turn finishes
+                    logger.debug(f"Chat {chat_id} is already processing")
+                    continue
                 if not chat_info.is_ready_to_process():
                     logger.debug(f"Chat {chat_id} is not ready to process")
+                    self.scheduler.schedule(chat_info)
                     continue
                 logger.info(f"Adding chat to process: {chat_id}")
-                tasks.append(asyncio.create_task(ai_processor.process_chat(chat_id)))
-
-            if not tasks:
-                logger.debug("No chats to process")
-                await asyncio.sleep(MINIMAL_SLEEP)
-                continue
-
-            logger.info(f"Processing {len(tasks)} chats")
-            await asyncio.gather(*tasks)
-            tasks.clear()
-            # Sleep if many time left
-            left_time = MINIMAL_SLEEP - (time.time() - last_processed)
-            logger.info(f"End processing, left time: {left_time}")
-            if left_time > 0:
-                await asyncio.sleep(left_time)
+                self.in_flight.add(chat_id)
+                task = asyncio.create_task(self._process_chat(ai_processor, chat_info))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def _process_chat(self, ai_processor: AIProcessor, chat_info: ChatProcessInfo):
+        stale = self.stale[chat_info.chat_id] = asyncio.Event()
+        try:
+            async with self.semaphore:
+                fetched_at = await ai_processor.process_chat(
+                    chat_info.chat_id, stale=stale
+                )
+            # Messages a restarted turn already answered do not start another one
+            chat_info.last_processed = max(chat_info.last_processed, fetched_at)
+        except Exception as e:
+            logger.exception(f"Error processing chat {chat_info.chat_id}: {e}")
+        finally:
+            self.stale.pop(chat_info.chat_id, None)
+            self.in_flight.discard(chat_info.chat_id)
+            self._schedule(chat_info)
+            logger.info(
+                f"End processing chat {chat_info.chat_id}, {len(self.in_flight)} in flight"
+            )
 
     async def run(self):
         logger.info("Starting worker")
-        await asyncio.gather(
-            self._update_chats(),
-            self._process_chats(),
-        )
+        tasks = [self._update_chats(), self._process_chats()]
+        if self.leases is not None:
+            tasks.append(self.leases.run(on_change=self._on_leases_changed))
+        await asyncio.gather(*tasks)
+
+    def _owns(self, chat_id: int) -> bool:
+        return self.leases is None or self.leases.owns(chat_id)
+
+    def _schedule(self, chat_info: ChatProcessInfo):
+        if self._owns(chat_info.chat_id):
+            self.scheduler.schedule(chat_info)
+
+    def _on_leases_changed(self, acquired: set[int], lost: set[int]):
+        for chat_info in self.chats.values():
+            shard = shard_of(chat_info.chat_id, self.leases.shards)
+            if shard in acquired:
+                self.scheduler.schedule(chat_info)
+            elif shard in lost:
+                self.scheduler.unschedule(chat_info.chat_id)
+
+    def _load_chat(self, chat: Chat, processed: bool = False) -> ChatProcessInfo:
+        self.chat_cache.set(chat.id, chat)
+        chat_info = self._set_default_chat_info(chat.id, processed=processed)
+        chat_info.update_settings(chat.ai_settings)
+        return chat_info
 
-    def _set_default_chat_info(self, chat_id: int) -> ChatProcessInfo:
+    def _evict_idle_chats(self):
+        """
+        Drop chats with no pending work and no activity for ``worker.idle``
+        seconds, they are reloaded on their next message.
+        """
+        idle_since = time.time() - settings.worker.idle
+        evicted = [
+            chat_id
+            for chat_id, chat_info in self.chats.items()
+            if chat_id not in self.in_flight
+            and chat_id not in self.scheduler
+            and chat_info.last_activity() < idle_since
+        ]
+        for chat_id in evicted:
+            del self.chats[chat_id]
+            self.chat_cache.pop(chat_id)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle chats, {len(self.chats)} left")
+
+    def _set_default_chat_info(
+        self, chat_id: int, processed: bool = False
+    ) -> ChatProcessInfo:
+        """
+        Get the info of a chat, a new one is pending unless ``processed``.
+        """
         chat_info = self.chats.get(chat_id)
         if chat_info is None:
-            chat_info = ChatProcessInfo(chat_id=chat_id)
+            if processed:
+                chat_info = ChatProcessInfo(
+                    chat_id=chat_id, last_processed=time.time(), last_updated=0.0
+                )
+            else:
+                chat_info = ChatProcessInfo(chat_id=chat_id, last_processed=0.0)
             self.chats[chat_id] = chat_info
             logger.info(f"Created chat info for chat: {chat_id}")
         return chat_info
 
+    async def _start_notifier(self) -> float:
+        """
+        Start listening for changes and return how long to wait between scans.
+        """
+        if isinstance(self.notifier, NullChangeNotifier):
+            return MINIMAL_SLEEP
+        try:
+            await self.notifier.start()
+        except Exception as e:
+            logger.error(f"Change notifications unavailable, polling instead: {e}")
+            return MINIMAL_SLEEP
+        return settings.notify.poll
+
+    async def _load_active_chats(self, db: DBReposContext) -> datetime:
+        """
+        Load the chats with a timer or recent activity as already processed,
+        return when the load started.
+
+        Only timers and messages written after the load schedule these chats,
+        a restart does not answer every recently active chat again.
+        """
+        loaded_at = datetime.now()
+        since = loaded_at - timedelta(seconds=settings.worker.idle)
+        chats = await db.chat.get_active_chats(since)
+        for chat in chats:
+            self._schedule(self._load_chat(chat, processed=True))
+        logger.info(f"Loaded {len(chats)} active chats")
+        return loaded_at
+
     async def _update_chats(self):
-        last_processed = datetime.fromtimestamp(0.0)
-        db = DBReposContext()
+        db = DBReposContext(notifier=self.notifier)
+        subscription = self.notifier.subscribe(kinds={MESSAGE, SETTINGS})
+        last_processed = await self._load_active_chats(db)
+        evicted_at = time.monotonic()
         while True:
+            poll_interval = await self._start_notifier()
+            scan_started = datetime.now()
             # Get updated chats settings
-            chats_settings = await db.chat.get_updated_chats_settings(last_processed)
-            for chat_setting in chats_settings:
-                chat_info = self._set_default_chat_info(chat_setting.chat_id)
-                chat_info.update_settings(chat_setting)
-                chat_info.set_last_updated(last_processed.timestamp())
-                logger.info(f"Updated chat info for chat: {chat_setting.chat_id}")
+            chats = await db.chat.get_updated_chats(last_processed)
+            for chat in chats:
+                chat_info = self._load_chat(chat)
+                chat_info.set_last_updated(scan_started.timestamp())
+                self._schedule(chat_info)
+                logger.info(f"Updated chat info for chat: {chat.id}")
             # Update last processed
             chat_ids = await db.chat.get_awaible_new_messages_in_chats(
                 last_processed,
                 except_types=[MessageType.TOOL_CALLS],  # MessageType.AI_REFLECTION
             )
+            # Reload settings of evicted chats
+            unknown_ids = [chat_id for chat_id in chat_ids if chat_id not in self.chats]
+            if unknown_ids:
+                for chat in await db.chat.get_chats_by_ids(unknown_ids):
+                    self._load_chat(chat)
             for chat_id in chat_ids:
                 chat_info = self._set_default_chat_info(chat_id)
-                chat_info.set_last_updated(last_processed.timestamp())
+                chat_info.set_last_updated(scan_started.timestamp())
+                self._schedule(chat_info)
+                if chat_id in self.stale:
+                    self.stale[chat_id].set()
                 logger.info(f"Updated chat info for chat: {chat_id}")
-            last_processed = datetime.now()
-            await asyncio.sleep(MINIMAL_SLEEP)
+            last_processed = scan_started
+            if time.monotonic() - evicted_at >= EVICT_INTERVAL:
+                evicted_at = time.monotonic()
+                self._evict_idle_chats()
+            # Sleep until a message or settings row is written, polling is only a fallback
+            events = await subscription.wait(timeout=poll_interval)
+            logger.debug(f"Woken up by {len(events)} change events")
@@ -0,0 +1,124 @@
+import asyncio
+import html
+import logging
+import re
+from contextlib import suppress
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import EditMessageText, SendMessage as SendMessageMethod
+
+from app.ai_provider.streaming import StreamRecorder, partial_json_string
+from app.ai_provider.tools.tg import SendMessage
+from app.bot.session_utils import PRIORITY_LOW
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Complete tags and a tag cut off at the end of the streamed text
+HTML_TAG_RE = re.compile(r"<[^>]*>|<[^>]*$")
+
+
+class MessageStreamer(StreamRecorder):
+    """
+    Delivers ``SendMessage`` texts while they are generated.
+
+    A preview message is sent as soon as the text starts streaming and is
+    edited as it grows, at most once per ``interval`` seconds. Previews are
+    sent by a task per tool call, so a rate limited chat does not slow down
+    reading the stream; texts superseded while a send waits are dropped. The
+    preview is plain text; ``SendMessage`` replaces it with the final
+    formatted message.
+    """
+
+    def __init__(self, bot: Bot, chat_id: int, interval: float = settings.worker.edits):
+        super().__init__()
+        self.bot = bot
+        self.chat_id = chat_id
+        self.interval = interval
+        # Tool call id -> Telegram message id of the preview
+        self.messages: dict[str, int] = {}
+        # Tool call id -> text waiting to be delivered
+        self._pending: dict[str, str] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._closed = asyncio.Event()
+
+    @property
+    def visible(self) -> bool:
+        """Whether a preview was (or is being) sent to the chat."""
+        return bool(self._tasks)
+
+    async def on_tool_call(
+        self, index: int, call_id: str | None, name: str, arguments: str
+    ) -> None:
+        await super().on_tool_call(index, call_id, name, arguments)
+        if call_id is None or name != SendMessage.__name__ or self._closed.is_set():
+            return
+        text = partial_json_string(arguments, "text")
+        if text is None:
+            return
+        text = html.unescape(HTML_TAG_RE.sub("", text)).strip()
+        if not text:
+            return
+        self._pending[call_id] = text
+        task = self._tasks.get(call_id)
+        if task is None or task.done():
+            self._tasks[call_id] = asyncio.create_task(self._deliver(call_id))
+
+    async def _deliver(self, call_id: str) -> None:
+        """
+        Send the preview of a tool call and edit it to the latest text.
+        """
+        delivered = None
+        while call_id in self._pending:
+            text = self._pending.pop(call_id)
+            if text == delivered:
+                continue
+            message_id = self.messages.get(call_id)
+            try:
+                if message_id is None:
+                    message = await self.bot(
+                        SendMessageMethod(
+                            chat_id=self.chat_id,
+                            text=text,
+                            no_save=True,
+                            parse_mode=None,
+                        )
+                    )
+                    self.messages[call_id] = message.message_id
+                else:
+                    # Intermediate edits give way to other sends
+                    await self.bot(
+                        EditMessageText(
+                            text=text,
+                            chat_id=self.chat_id,
+                            message_id=message_id,
+                            parse_mode=None,
+                            priority=PRIORITY_LOW,
+                        )
+                    )
+                delivered = text
+            except TelegramAPIError as e:
+                logger.warning(f"Error streaming message to chat_id {self.chat_id}: {e}")
+            # The interval counts from the completed send
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._closed.wait(), timeout=self.interval)
+
+    async def close(self) -> None:
+        """
+        Stop updating previews, wait for the sends in progress.
+        """
+        self._closed.set()
+        self._pending.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def discard(self) -> None:
+        """
+        Delete previews that were not finalized by a ``SendMessage`` call.
+        """
+        await self.close()
+        for message_id in self.messages.values():
+            with suppress(TelegramAPIError):
+                await self.bot.delete_message(chat_id=self.chat_id, message_id=message_id)
+        self.messages.clear()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import math
+import os
+import socket
+import uuid
+from typing import Callable
+
+from app.db import DBReposContext
+
+logger = logging.getLogger(__name__)
+
+LeasesChangedCallback = Callable[[set[int], set[int]], None]
+
+
+def shard_of(chat_id: int, shards: int) -> int:
+    return chat_id % shards
+
+
+class ShardLeaseManager:
+    """
+    Leases chat shards to this worker instance so replicas never share a chat.
+
+    Chats are hashed to ``shards`` shards. Every heartbeat the worker renews
+    its leases and moves towards its fair share of shards (shards divided by
+    live workers): surplus shards are released for newcomers and expired
+    leases of dead workers are claimed. A surplus shard with chats still in
+    flight is kept, without starting new turns, until they finish.
+    """
+
+    def __init__(
+        self,
+        db: DBReposContext,
+        shards: int,
+        ttl: float,
+        interval: float,
+        worker_id: str | None = None,
+        in_flight: set[int] | None = None,
+    ):
+        self.db = db
+        self.shards = shards
+        self.ttl = ttl
+        self.interval = interval
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        # Chats being processed, their shards are not released
+        self.in_flight = in_flight if in_flight is not None else set()
+        self.owned: set[int] = set()
+        # Surplus shards kept until their chats in flight finish
+        self.draining: set[int] = set()
+
+    def owns(self, chat_id: int) -> bool:
+        return shard_of(chat_id, self.shards) in self.owned
+
+    async def _sync(self) -> tuple[set[int], set[int]]:
+        live_workers = await self.db.lease.heartbeat(self.worker_id, self.ttl)
+        target = math.ceil(self.shards / max(live_workers, 1))
+        busy = {shard_of(chat_id, self.shards) for chat_id in self.in_flight}
+        owned, draining = await self.db.lease.sync_leases(
+            self.worker_id, self.shards, self.ttl, target, busy=busy
+        )
+        owned, self.draining = set(owned), set(draining)
+        acquired, lost = owned - self.owned, self.owned - owned
+        self.owned = owned
+        if acquired or lost:
+            logger.info(
+                f"Worker {self.worker_id} owns {len(owned)}/{self.shards} shards "
+                f"({live_workers} live workers), acquired {sorted(acquired)}, lost {sorted(lost)}, "
+                f"draining {sorted(self.draining)}"
+            )
+        return acquired, lost
+
+    async def run(self, on_change: LeasesChangedCallback):
+        await self.db.lease.create_shards(self.shards)
+        try:
+            while True:
+                try:
+                    acquired, lost = await self._sync()
+                except Exception as e:
+                    # Without a renewal our leases expire, stop processing them in time
+                    logger.error(f"Error renewing shard leases: {e}")
+                    acquired, lost = set(), set(self.owned)
+                    self.owned = set()
+                    self.draining = set()
+                if acquired or lost:
+                    on_change(acquired, lost)
+                await asyncio.sleep(self.interval)
+        finally:
+            self.owned = set()
+            self.draining = set()
+            await self.db.lease.release(self.worker_id)
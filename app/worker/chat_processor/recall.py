@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from app.ai_provider import AIProvider
+from app.ai_provider.conversation import ConversationBuilder
+from app.ai_provider.embeddings import normalize
+from app.config import settings
+from app.db import Chat, DBReposContext, Message, MessageType
+
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Messages embedded into the index
+RECALLED_TYPES = (MessageType.TEXT, MessageType.AI_REFLECTION)
+
+
+class ChatRecall:
+    """
+    Retrieves older messages of a chat relevant to the latest ones.
+
+    Messages are embedded in batches into a per-chat ``VectorIndex`` by a
+    background task; the query is the mean of the newest messages of the
+    window, the only embedding request made during a turn.
+    """
+
+    def __init__(
+        self,
+        db: DBReposContext,
+        ai_provider: AIProvider,
+        conversation_builder: ConversationBuilder,
+        embedder: str = settings.recall.embedder,
+        path: str = settings.recall.path,
+        k: int = settings.recall.k,
+        budget: int = settings.recall.budget,
+        batch: int = settings.recall.batch,
+        query: int = settings.recall.query,
+    ):
+        self.db = db
+        self.conversation_builder = conversation_builder
+        self.embedder = ai_provider.get_embedder(embedder) if embedder else None
+        self.path = Path(path)
+        self.k = k
+        self.batch = batch
+        self.query = query
+        self.budget = budget if self.enabled else 0
+        # Chat id -> running index update
+        self._updates: dict[int, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.embedder is not None and self.k > 0
+
+    def _get_index(self, chat_id: int) -> VectorIndex:
+        return VectorIndex(
+            self.path / self.embedder.name / str(chat_id), self.embedder.dim
+        )
+
+    def schedule_update(self, chat: Chat) -> None:
+        """
+        Start indexing the chat in the background unless it already runs.
+        """
+        task = self._updates.get(chat.id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run_update(chat))
+        self._updates[chat.id] = task
+        task.add_done_callback(lambda _: self._forget_update(chat.id, task))
+
+    def _forget_update(self, chat_id: int, task: asyncio.Task) -> None:
+        if self._updates.get(chat_id) is task:
+            del self._updates[chat_id]
+
+    async def _run_update(self, chat: Chat) -> None:
+        try:
+            await self.update_index(chat)
+        except Exception as e:
+            logger.error(f"Error indexing messages of chat_id {chat.id}: {e}")
+
+    async def update_index(self, chat: Chat) -> VectorIndex:
+        """
+        Embed the messages of the chat that are not indexed yet.
+        """
+        index = self._get_index(chat.id)
+        while True:
+            messages = await self.db.message.get_messages_between(
+                chat_id=chat.id, after_id=index.cursor, limit=self.batch
+            )
+            if not messages:
+                break
+            messages_to_embed = [
+                message
+                for message in messages
+                if message.type in RECALLED_TYPES and message.content
+            ]
+            vectors = await self.embedder.embed(
+                [message.content for message in messages_to_embed]
+            )
+            await asyncio.to_thread(
+                index.append,
+                [message.id for message in messages_to_embed],
+                vectors,
+                messages[-1].id,
+            )
+            if len(messages) < self.batch:
+                break
+        return index
+
+    async def recall(self, chat: Chat, window: list[Message]) -> list[Message]:
+        """
+        Find the older messages most relevant to the context window.
+
+        Args:
+            chat (Chat): The chat to search.
+            window (list[Message]): The context window, newest first.
+
+        Returns:
+            list[Message]: Relevant messages older than the window that fit
+                the recall token budget, oldest first.
+        """
+        if not self.enabled or not window:
+            return []
+        self.schedule_update(chat)
+        index = self._get_index(chat.id)
+        texts = [
+            message.content
+            for message in window[: self.query]
+            if message.type in RECALLED_TYPES and message.content
+        ]
+        if not len(index) or not texts:
+            return []
+        try:
+            query = await self.embedder.embed(texts)
+        except Exception as e:
+            logger.warning(f"Error embedding recall query for chat_id {chat.id}: {e}")
+            return []
+        query = normalize(query.mean(axis=0, keepdims=True))[0]
+        hits = await asyncio.to_thread(index.search, query, self.k, window[-1].id)
+        if not hits:
+            return []
+
+        messages = await self.db.message.get_messages_by_ids(
+            chat_id=chat.id, ids=[message_id for message_id, _ in hits]
+        )
+        by_id = {message.id: message for message in messages}
+        recalled = []
+        tokens = 0
+        for message_id, score in hits:
+            message = by_id.get(message_id)
+            if message is None:
+                continue
+            tokens += self.conversation_builder.estimate([message])
+            if tokens > self.budget:
+                break
+            recalled.append(message)
+        logger.debug(f"Recalled {len(recalled)} messages for chat_id: {chat.id}")
+        return sorted(recalled, key=lambda message: message.id)
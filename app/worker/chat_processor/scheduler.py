@@ -0,0 +1,83 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from .types import ChatProcessInfo
+
+
+class ChatScheduler:
+    """
+    Timer heap of chats ordered by the time they become eligible for processing.
+
+    Every chat has at most one live deadline, superseded heap entries are
+    skipped lazily. Dormant chats (nothing pending and no max not response
+    time) are not kept in the heap at all.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, int]] = []
+        self._deadlines: dict[int, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._deadlines
+
+    def schedule(self, chat_info: ChatProcessInfo) -> None:
+        """
+        (Re)compute the deadline of a chat after its state changed.
+        """
+        deadline = chat_info.next_process_time()
+        if deadline is None:
+            self.unschedule(chat_info.chat_id)
+            return
+        if self._deadlines.get(chat_info.chat_id) == deadline:
+            return
+        self._deadlines[chat_info.chat_id] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), chat_info.chat_id))
+        if self._heap[0][2] == chat_info.chat_id:
+            self._wakeup.set()
+
+    def unschedule(self, chat_id: int) -> None:
+        self._deadlines.pop(chat_id, None)
+
+    def pop_due(self, now: float | None = None) -> list[int]:
+        """
+        Remove and return the chats whose deadline has passed.
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, chat_id = heapq.heappop(self._heap)
+            if self._deadlines.get(chat_id) != deadline:
+                continue
+            del self._deadlines[chat_id]
+            due.append(chat_id)
+        return due
+
+    def next_deadline(self) -> float | None:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    async def wait(self) -> None:
+        """
+        Sleep until the earliest deadline or until an earlier one is scheduled.
+        """
+        self._wakeup.clear()
+        deadline = self.next_deadline()
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            deadline, _, chat_id = self._heap[0]
+            if self._deadlines.get(chat_id) == deadline:
+                return
+            heapq.heappop(self._heap)
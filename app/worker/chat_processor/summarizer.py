@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+from uuid import UUID
+
+from app.ai_provider import AIProvider
+from app.ai_provider.conversation import ConversationBuilder
+from app.config import settings
+from app.constants import SUMMARY_PROMPT
+from app.db import Chat, ChatSummary, DBReposContext, Message
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSummarizer:
+    """
+    Keeps a rolling summary of the chat history older than the context window.
+
+    The summary is folded forward: every ``every`` messages that fell out of
+    the window are summarized together with the previous summary.
+    """
+
+    def __init__(
+        self,
+        db: DBReposContext,
+        ai_provider: AIProvider,
+        conversation_builder: ConversationBuilder,
+        every: int = settings.summary.every,
+        batch: int = settings.summary.batch,
+    ):
+        self.db = db
+        self.ai_provider = ai_provider
+        self.conversation_builder = conversation_builder
+        self.every = every
+        self.batch = batch
+        # Chat id -> running summary update
+        self._updates: dict[int, asyncio.Task] = {}
+
+    def schedule_update(
+        self, chat: Chat, summary: ChatSummary | None, before_id: UUID
+    ) -> None:
+        """
+        Start updating the summary in the background unless it already runs.
+        """
+        task = self._updates.get(chat.id)
+        if not self.every or (task is not None and not task.done()):
+            return
+        task = asyncio.create_task(self._run_update(chat, summary, before_id))
+        self._updates[chat.id] = task
+        task.add_done_callback(lambda _: self._forget_update(chat.id, task))
+
+    def _forget_update(self, chat_id: int, task: asyncio.Task) -> None:
+        if self._updates.get(chat_id) is task:
+            del self._updates[chat_id]
+
+    async def _run_update(
+        self, chat: Chat, summary: ChatSummary | None, before_id: UUID
+    ) -> None:
+        try:
+            await self.update_summary(chat=chat, summary=summary, before_id=before_id)
+        except Exception as e:
+            logger.error(f"Error summarizing chat_id {chat.id}: {e}")
+
+    async def update_summary(
+        self, chat: Chat, summary: ChatSummary | None, before_id: UUID
+    ) -> ChatSummary | None:
+        """
+        Summarize the messages between the current summary and the window.
+
+        Args:
+            chat (Chat): The chat to summarize.
+            summary (ChatSummary): The current summary of the chat, if any.
+            before_id (UUID): The oldest message of the context window.
+
+        Returns:
+            ChatSummary | None: The up to date summary.
+        """
+        if not self.every:
+            return summary
+        after_id = summary.last_message_id if summary is not None else None
+        count = await self.db.message.count_messages_between(
+            chat_id=chat.id, after_id=after_id, before_id=before_id
+        )
+        if count < self.every:
+            return summary
+
+        messages = await self.db.message.get_messages_between(
+            chat_id=chat.id, after_id=after_id, before_id=before_id, limit=self.batch
+        )
+        ai_service = self.ai_provider.get_ai_service(chat.ai_settings.provider)
+        if ai_service is None:
+            logger.error(f"AI service {chat.ai_settings.provider} not found")
+            return summary
+        response = await ai_service.generate_response(
+            messages=self._build_request(summary, messages), tools=[]
+        )
+        if not response.response:
+            logger.warning(f"Empty summary generated for chat_id: {chat.id}")
+            return summary
+
+        summary = await self.db.summary.save_summary(
+            chat_id=chat.id,
+            content=response.response.strip(),
+            last_message_id=messages[-1].id,
+        )
+        logger.info(f"Summarized {len(messages)} messages for chat_id: {chat.id}")
+        return summary
+
+    def _build_request(
+        self, summary: ChatSummary | None, messages: list[Message]
+    ) -> list[dict]:
+        # Tool calls are flattened to text, the request itself has no tools
+        transcript = "\n".join(
+            f"{entry['role']}: {entry.get('content') or json.dumps(entry.get('tool_calls'))}"
+            for entry in self.conversation_builder.render(messages)
+        )
+        return [
+            {
+                "role": "system",
+                "content": SUMMARY_PROMPT.format(
+                    summary=summary.content if summary is not None else ""
+                ),
+            },
+            {"role": "user", "content": transcript},
+        ]
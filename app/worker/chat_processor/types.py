@@ -4,7 +4,7 @@ from dataclasses import dataclass, field
 from app.db import ChatAISettings
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatProcessInfo:
     chat_id: int
     last_processed: float = field(default_factory=time.time)
@@ -33,5 +33,22 @@ class ChatProcessInfo:
             self.last_processed = time.time()
         return is_ready
 
+    def next_process_time(self) -> float | None:
+        """
+        Earliest time ``is_ready_to_process`` can return True, None if only
+        a new update can make the chat ready.
+        """
+        min_delay = self.min_delay_between_messages or 0
+        # Pending update, only the min delay applies
+        if self.last_updated >= self.last_processed:
+            return self.last_processed + min_delay
+        # Max not response time
+        if self.max_not_response_time is not None:
+            return self.last_processed + max(self.max_not_response_time, min_delay)
+        return None
+
+    def last_activity(self) -> float:
+        return max(self.last_processed, self.last_updated)
+
     def set_last_updated(self, last_updated: float):
         self.last_updated = last_updated
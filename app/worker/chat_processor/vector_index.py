@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+from uuid import UUID
+
+import numpy as np
+
+# Rows converted to float32 at once during a search
+SEARCH_CHUNK = 65536
+
+
+class VectorIndex:
+    """
+    Append-only embedding matrix of one chat, memory-mapped from disk.
+
+    Vectors are stored as float16 rows in message id order, next to the
+    message ids (two big-endian uint64 halves, so they stay sortable).
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.vectors_path = path.with_suffix(".vec")
+        self.ids_path = path.with_suffix(".ids")
+        self.cursor_path = path.with_suffix(".cursor")
+
+    def __len__(self) -> int:
+        if not self.ids_path.exists() or not self.vectors_path.exists():
+            return 0
+        return min(
+            self.ids_path.stat().st_size // 16,
+            self.vectors_path.stat().st_size // (self.dim * 2),
+        )
+
+    @property
+    def cursor(self) -> UUID | None:
+        """The newest message already seen by the index."""
+        if not self.cursor_path.exists():
+            return None
+        return UUID(self.cursor_path.read_text().strip())
+
+    def append(self, ids: list[UUID], vectors: np.ndarray, cursor: UUID) -> None:
+        """
+        Append normalized vectors of messages newer than the indexed ones.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = len(self)
+        if ids:
+            # Drop a torn tail left by an interrupted append
+            for path, row_size in ((self.vectors_path, self.dim * 2), (self.ids_path, 16)):
+                if path.exists():
+                    os.truncate(path, size * row_size)
+            with open(self.vectors_path, "ab") as file:
+                file.write(vectors.astype(np.float16).tobytes())
+            with open(self.ids_path, "ab") as file:
+                file.write(b"".join(message_id.bytes for message_id in ids))
+        self.cursor_path.write_text(cursor.hex)
+
+    def search(
+        self, query: np.ndarray, k: int, before_id: UUID | None = None
+    ) -> list[tuple[UUID, float]]:
+        """
+        Find the rows most similar to the query by cosine similarity.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            k (int): The number of rows to return.
+            before_id (UUID): Only search messages older than this one.
+
+        Returns:
+            list[tuple[UUID, float]]: Message ids and scores, best first.
+        """
+        size = len(self)
+        if not size or k <= 0:
+            return []
+        ids = np.memmap(self.ids_path, dtype=">u8", mode="r", shape=(size, 2))
+        if before_id is not None:
+            size = self._count_before(ids, before_id)
+            if not size:
+                return []
+        vectors = np.memmap(
+            self.vectors_path, dtype=np.float16, mode="r", shape=(size, self.dim)
+        )
+        query = query.astype(np.float32)
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, SEARCH_CHUNK):
+            chunk = vectors[start : start + SEARCH_CHUNK].astype(np.float32)
+            scores[start : start + len(chunk)] = chunk @ query
+        k = min(k, size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (UUID(bytes=ids[row].astype(">u8").tobytes()), float(scores[row]))
+            for row in best
+        ]
+
+    def _count_before(self, ids: np.ndarray, before_id: UUID) -> int:
+        high, low = divmod(before_id.int, 1 << 64)
+        start = int(np.searchsorted(ids[:, 0], high, side="left"))
+        end = int(np.searchsorted(ids[:, 0], high, side="right"))
+        return start + int(np.count_nonzero(ids[start:end, 1] < low))
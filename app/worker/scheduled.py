@@ -1,31 +1,97 @@
-import asyncio
+import heapq
 import logging
+from datetime import datetime, timedelta
 
-from app.db import DBReposContext, MessageType
+from app.config import settings
+from app.db import DBReposContext
+from app.db.notify import (
+    SCHEDULED,
+    BaseChangeNotifier,
+    NullChangeNotifier,
+    get_change_notifier,
+)
 
+# Reload interval when change notifications are unavailable
 MINIMAL_SLEEP = 10
 
 logger = logging.getLogger(__name__)
 
+
 class ScheduledWorker:
-    def __init__(self, assistant_id: int):
-        self.db = DBReposContext()
+    """
+    Delivers scheduled notifications at their due time.
+
+    Due times of the next ``window`` seconds are kept in a heap and the worker
+    sleeps until the earliest one. A newly scheduled notification wakes it up
+    through the change notifier and the heap is reloaded.
+    """
+
+    def __init__(self, assistant_id: int, notifier: BaseChangeNotifier | None = None):
+        self.notifier = notifier or get_change_notifier()
+        self.db = DBReposContext(notifier=self.notifier)
         self.assistant_id = assistant_id
-    
-    async def _run(self):
-        logger.info("Running scheduled worker")
-        scheduled_messages = await self.db.scheduled.get_all_not_done()
-        for scheduled_message in scheduled_messages:
-            await self.db.message.create_message(
-                chat_id=scheduled_message.chat_id,
-                from_user_id=self.assistant_id,
-                type=MessageType.NOTIFICATION,
-                content=scheduled_message.message,
-            )
-        await self.db.scheduled.marks_as_done([s.id for s in scheduled_messages])
-        logger.info(f"Scheduled worker finished. Processed {len(scheduled_messages)} messages")
+        self.window = settings.scheduled.window
+        self.size = settings.scheduled.size
+        self.batch = settings.scheduled.batch
+        self._heap: list[datetime] = []
+        self._loaded_until = datetime.min
+
+    async def _load(self) -> None:
+        """
+        Load the due times of the pending notifications of the next window.
+        """
+        until = datetime.now() + timedelta(seconds=self.window)
+        pending = await self.db.scheduled.get_pending(until, self.size)
+        if len(pending) == self.size:
+            # Later notifications did not fit, load them once these are due
+            until = pending[-1].date
+        # Sorted by date, so already a heap
+        self._heap = [scheduled.date for scheduled in pending]
+        self._loaded_until = until
+
+    async def _drain(self) -> None:
+        """
+        Deliver every due notification.
+        """
+        now = datetime.now()
+        while True:
+            delivered = await self.db.scheduled.deliver_due(self.assistant_id, self.batch)
+            if delivered:
+                logger.info(f"Delivered {len(delivered)} scheduled notifications")
+            if len(delivered) < self.batch:
+                break
+        while self._heap and self._heap[0] <= now:
+            heapq.heappop(self._heap)
+
+    def _next_wakeup(self) -> datetime:
+        return self._heap[0] if self._heap else self._loaded_until
+
+    async def _start_notifier(self) -> bool:
+        """
+        Start listening for changes, return whether notifications are delivered.
+        """
+        if isinstance(self.notifier, NullChangeNotifier):
+            return False
+        try:
+            await self.notifier.start()
+        except Exception as e:
+            logger.error(f"Change notifications unavailable, polling instead: {e}")
+            return False
+        return True
 
     async def run(self):
+        logger.info("Running scheduled worker")
+        subscription = self.notifier.subscribe(kinds={SCHEDULED})
+        reload = True
         while True:
-            await self._run()
-            await asyncio.sleep(MINIMAL_SLEEP)
+            listening = await self._start_notifier()
+            if reload or datetime.now() >= self._loaded_until:
+                await self._load()
+            if datetime.now() >= self._next_wakeup():
+                await self._drain()
+            timeout = max((self._next_wakeup() - datetime.now()).total_seconds(), 0)
+            if not listening:
+                timeout = min(timeout, MINIMAL_SLEEP)
+            events = await subscription.wait(timeout=timeout)
+            # Only a new notification can be due earlier than the loaded ones
+            reload = not listening or bool(events)
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of ConversationBuilder.build.
+
+Run with ``python -m benchmarks.conversation``.
+"""
+
+import timeit
+from datetime import datetime, timedelta
+
+from app.ai_provider.conversation import ConversationBuilder, rendered_messages
+from app.db import Chat, ChatAISettings, ChatType, Message, MessageType, User
+from app.db.models import uuid7
+
+ASSISTANT_ID = 1
+WINDOWS = (10, 100, 1000)
+USERS = 20
+
+
+def make_window(size: int) -> tuple[Chat, list[Message]]:
+    chat = Chat(id=-100, title="Benchmark", username=None, type=ChatType.SUPERGROUP)
+    chat.ai_settings = ChatAISettings(chat_id=chat.id, prompt="Be brief.")
+    users = [
+        User(
+            id=user_id,
+            first_name=f"User {user_id}",
+            last_name=None,
+            username=f"user{user_id}",
+        )
+        for user_id in range(ASSISTANT_ID, ASSISTANT_ID + USERS)
+    ]
+    started = datetime(2025, 1, 1)
+    messages = []
+    for number in range(size):
+        user = users[number % USERS]
+        payload = {}
+        if number:
+            # Every message replies to the previous one
+            payload["reply_to"] = {
+                "id": number - 1,
+                "type": "reply",
+                "content": f"message {number - 1}",
+            }
+        messages.append(
+            Message(
+                id=uuid7(),
+                type=MessageType.TEXT,
+                content=f"message {number}",
+                payload=payload,
+                from_user_id=user.id,
+                from_user=user,
+                chat_id=chat.id,
+                telegram_id=number,
+                created_at=started + timedelta(seconds=number),
+            )
+        )
+    return chat, messages
+
+
+def main():
+    builder = ConversationBuilder(assistant_user_id=ASSISTANT_ID)
+    for size in WINDOWS:
+        chat, messages = make_window(size)
+        number = max(1, 2000 // size)
+
+        def build_cold():
+            rendered_messages.clear()
+            builder.build(chat, reversed(messages))
+
+        def build_warm():
+            builder.build(chat, reversed(messages))
+
+        cold = timeit.timeit(build_cold, number=number) / number
+        warm = timeit.timeit(build_warm, number=number) / number
+        print(
+            f"{size:>5} messages: {cold * 1000:8.3f} ms rendered, "
+            f"{warm * 1000:8.3f} ms memoized per build"
+        )
+
+
+if __name__ == "__main__":
+    main()
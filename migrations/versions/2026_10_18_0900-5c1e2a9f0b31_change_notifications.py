@@ -0,0 +1,77 @@
+"""change notifications
+
+Revision ID: 5c1e2a9f0b31
+Revises: d077b3f4f204
+Create Date: 2026-10-18 09:00:12.417305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e2a9f0b31"
+down_revision: Union[str, None] = "d077b3f4f204"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The channel PostgresChangeNotifier listens on
+CHANNEL = settings.notify.channel
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_message_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                '{CHANNEL}',
+                json_build_object(
+                    'kind', 'message',
+                    'chat_id', NEW.chat_id,
+                    'type', NEW.type::text
+                )::text
+            );
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_settings_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                '{CHANNEL}',
+                json_build_object('kind', 'settings', 'chat_id', NEW.chat_id)::text
+            );
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER messages_notify_change
+        AFTER INSERT ON messages
+        FOR EACH ROW EXECUTE FUNCTION notify_message_change()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER chat_ai_settings_notify_change
+        AFTER INSERT OR UPDATE ON chat_ai_settings
+        FOR EACH ROW EXECUTE FUNCTION notify_settings_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS chat_ai_settings_notify_change ON chat_ai_settings")
+    op.execute("DROP TRIGGER IF EXISTS messages_notify_change ON messages")
+    op.execute("DROP FUNCTION IF EXISTS notify_settings_change()")
+    op.execute("DROP FUNCTION IF EXISTS notify_message_change()")
@@ -0,0 +1,47 @@
+"""hot query indexes
+
+Revision ID: b3f9c0d41e72
+Revises: 8e4b7d2c6a15
+Create Date: 2026-10-18 10:00:07.934112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3f9c0d41e72"
+down_revision: Union[str, None] = "8e4b7d2c6a15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_messages_chat_id_created_at_id",
+        "messages",
+        ["chat_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "ix_messages_created_at", "messages", ["created_at"], unique=False
+    )
+    op.create_index(
+        "ix_scheduled_date_not_done",
+        "scheduled",
+        ["date"],
+        unique=False,
+        postgresql_where=sa.text("NOT is_done"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_scheduled_date_not_done",
+        table_name="scheduled",
+        postgresql_where=sa.text("NOT is_done"),
+    )
+    op.drop_index("ix_messages_created_at", table_name="messages")
+    op.drop_index("ix_messages_chat_id_created_at_id", table_name="messages")
@@ -0,0 +1,76 @@
+"""time ordered ids
+
+Revision ID: f27a6c8e93d0
+Revises: b3f9c0d41e72
+Create Date: 2026-10-18 10:30:52.601847
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f27a6c8e93d0"
+down_revision: Union[str, None] = "b3f9c0d41e72"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # UUIDv7: 48 bit unix milliseconds, version 7, random rest (gen_random_uuid)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7(ts timestamptz DEFAULT clock_timestamp())
+        RETURNS uuid AS $$
+        BEGIN
+            RETURN encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            PLACING substring(int8send(floor(extract(epoch FROM ts) * 1000)::bigint) FROM 3)
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid;
+        END;
+        $$ LANGUAGE plpgsql VOLATILE
+        """
+    )
+    # Existing rows get ids derived from their creation time, so they sort
+    # before new ones and the id alone orders messages
+    op.execute("UPDATE messages SET id = uuid_generate_v7(created_at)")
+    op.execute("UPDATE scheduled SET id = uuid_generate_v7(created_at)")
+    op.alter_column(
+        "messages", "id", server_default=sa.text("uuid_generate_v7()")
+    )
+    op.alter_column(
+        "scheduled", "id", server_default=sa.text("uuid_generate_v7()")
+    )
+
+    op.drop_index("ix_messages_chat_id_created_at_id", table_name="messages")
+    op.create_index(
+        "ix_messages_chat_id_id",
+        "messages",
+        ["chat_id", sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_chat_id_id", table_name="messages")
+    op.create_index(
+        "ix_messages_chat_id_created_at_id",
+        "messages",
+        ["chat_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    op.alter_column("scheduled", "id", server_default=None)
+    op.alter_column("messages", "id", server_default=None)
+    op.execute("DROP FUNCTION IF EXISTS uuid_generate_v7(timestamptz)")
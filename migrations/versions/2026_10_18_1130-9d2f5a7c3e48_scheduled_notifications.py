@@ -0,0 +1,51 @@
+"""scheduled notifications
+
+Revision ID: 9d2f5a7c3e48
+Revises: 4a8d2e6b1c93
+Create Date: 2026-10-18 11:30:08.614027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d2f5a7c3e48"
+down_revision: Union[str, None] = "4a8d2e6b1c93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The channel PostgresChangeNotifier listens on
+CHANNEL = settings.notify.channel
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_scheduled_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                '{CHANNEL}',
+                json_build_object('kind', 'scheduled', 'chat_id', NEW.chat_id)::text
+            );
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER scheduled_notify_change
+        AFTER INSERT ON scheduled
+        FOR EACH ROW EXECUTE FUNCTION notify_scheduled_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS scheduled_notify_change ON scheduled")
+    op.execute("DROP FUNCTION IF EXISTS notify_scheduled_change()")